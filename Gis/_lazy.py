@@ -0,0 +1,44 @@
+import importlib
+import sys
+import types
+
+##### modules imported on first attribute access #####
+### osmnx, networkx and scipy take seconds to import -> worker processes that never touch them should not pay for it
+
+_proxies = {}
+
+
+class LazyModule(types.ModuleType):
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_hooks'] = []
+        self.__dict__['_loaded'] = False
+
+    def _load(self):
+        module = importlib.import_module(self.__name__)
+        if not self.__dict__['_loaded']:
+            #### later lookups hit the proxy dict directly, no __getattr__ round trip
+            self.__dict__.update(module.__dict__)
+            self.__dict__['_loaded'] = True
+            for hook in self.__dict__['_hooks']:
+                hook(module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+### one shared proxy per module, on_load(module) runs once right after the real import ###
+def lazy_import(name,on_load=None):
+    proxy = _proxies.get(name)
+    if proxy is None:
+        proxy = _proxies[name] = LazyModule(name)
+    if on_load is not None:
+        if proxy.__dict__['_loaded']:
+            on_load(sys.modules[name])
+        else:
+            proxy.__dict__['_hooks'].append(on_load)
+    return proxy
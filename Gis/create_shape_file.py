@@ -1,18 +1,28 @@
-import osmnx as ox
+import logging
 import pandas as pd
 import numpy as np
-from matplotlib import pyplot as plt
 import shapely
 import geopandas as gpd
 import os
-import mplleaflet
+import pickle
 import geo_utils as gu
 import reachability
-import networkx as nx
+import graph_store
+import graph_arrays
+import layer_store
+import projection
+from instrumentation import stage
+from _lazy import lazy_import
 from shapely.geometry import Point
 
+log = logging.getLogger(__name__)
 
-ox.config(log_console=True,use_cache=False)
+### osmnx settings are applied when osmnx is first used, not when this module is imported
+def configure_osmnx(ox):
+    ox.config(log_console=True,use_cache=False)
+
+ox = lazy_import('osmnx',on_load=configure_osmnx)
+nx = lazy_import('networkx')
 # ox.config(log_console=True, use_cache=True)
 
 ##### makros #######
@@ -27,6 +37,8 @@ poi_tags = {'amenity':['cafe','restaurant','kindergarten','atm','bank','social_f
 health = {'amenity':['pharmacy','hospital','doctors','dentist','clinic'],'healthcare':True}
 publicTransport_tags = {'highway':['bus_stop','platform'], 'railway':['station','halt','tram_stop']}
 citys = ["Havelland, Germany","Berlin, Germany"]
+themes = {'Green_layer_berlinHavelland':green_tags,'Shop_layer_berlinHavelland':shop_tags,'Poi_layer_berlinHavelland':poi_tags,
+'Health_layer_berlinHavelland':health,'PublicTransport_layer_berlinHavelland':publicTransport_tags}
 
 ####### save functions #####
 
@@ -35,17 +47,21 @@ def save_streetG(places, network_type='walk',layer_name=f'roads'):
     layer_name += f'_{network_type}'
     for place in places:
         location_name = place.split(',')[0]
-        print(f"start with {place}")
+        log.info(f"start with {place}")
         G = ox.graph.graph_from_place(place, network_type=network_type,simplify=False)
         nx.write_gpickle(G,f'roads_{network_type}_{location_name}.pkl')
         
-### convert gpickle graph to shapfile
-def convert_G(pickle_path,folder_path='Gis_layers',subfolder_path='layer'):
+### convert gpickle graph to shapfile (or to the columnar graph format with columnar=True)
+def convert_G(pickle_path,folder_path='Gis_layers',subfolder_path='layer',columnar=False):
     dir = make_dir(f"{folder_path}/{subfolder_path}")
     G = nx.read_gpickle(pickle_path)
-    print("loaded graph start unpacking ...")
+    if columnar:
+        log.info(f"start saving columnar graph to disc at {dir}...")
+        graph_arrays.write_columnar_graph(G,dir)
+        return
+    log.info("loaded graph start unpacking ...")
     n,e = ox.graph_to_gdfs(G)
-    print(f"start saving to disc at {folder_path}/{dir}...")
+    log.info(f"start saving to disc at {folder_path}/{dir}...")
     n.to_file(f'{dir}/nodes.shp', driver='ESRI Shapefile')
     e.to_file(f'{dir}/edges.shp', driver='ESRI Shapefile')
 
@@ -53,30 +69,88 @@ def convert_G(pickle_path,folder_path='Gis_layers',subfolder_path='layer'):
 def get_osm_for_place(places,tags,extra=None,layer_name='Max_Gis_layers'):
     place_lst = []
     for place in places:
-        print(f"start with {place}")
+        log.info(f"start with {place}")
         tag_lst =['geometry']
         tag_lst.extend(list(tags.keys() ) )
         gdf = ox.geometries.geometries_from_place(place, tags=tags)
         if len(gdf) == 0:
             return gdf
-        if 'nodes' in gdf.columns:
-            gdf = gdf.reset_index().drop(columns=['osmid','nodes']).copy() #reindex and delete useless data / drop all columns with >1 nan value
-        else:
-            gdf = gdf.reset_index().drop(columns=['osmid']).copy()
         if extra != None:
             tag_lst.extend(extra)
-        gdf = gdf.rename(columns={'element_type': "geom_type"})
-        gdf = gdf.set_index('geom_type')
-        gdf = gdf.rename(columns={'nature_reserve': "Nreserve"})
-        gdf = gdf.rename(columns={'village_green': "VillGreen"})
-        gdf = gdf.rename(columns={'recreation_ground': "recreation"})
-        gdf = gdf[~ (gdf.geometry.geom_type == 'LineString')]
-        place_lst.append(gdf)
+        place_lst.append(clean_osm_gdf(gdf))
     appended_data = pd.concat(place_lst)
     save(layer_name,appended_data,tag_lst)
 
+### save osm data for all themes (layer name -> tags) with one query per place
+def get_osm_for_themes(places,themes,extra=None):
+    place_lst = []
+    tags = merge_tags(themes)
+    for place in places:
+        log.info(f"start with {place}")
+        gdf = ox.geometries.geometries_from_place(place, tags=tags)
+        if len(gdf) > 0:
+            place_lst.append(clean_osm_gdf(gdf))
+    if len(place_lst) == 0:
+        return None
+    appended_data = pd.concat(place_lst)
+    save_themes(appended_data,themes,extra)
+    return appended_data
+
+### write one layer per theme, every feature goes to each theme it matches
+def save_themes(gdf,themes,extra=None):
+    for layer_name, tags in themes.items():
+        theme_gdf = gdf[match_tags(gdf,tags)]
+        if len(theme_gdf) == 0:
+            log.info(f"no data for {layer_name}")
+            continue
+        tag_lst = ['geometry']
+        tag_lst.extend(list(tags.keys()))
+        if extra != None:
+            tag_lst.extend(extra)
+        save(layer_name,theme_gdf,tag_lst)
+
 ####### helper #########
 
+### helper to combine the tags of several themes into one osm query
+def merge_tags(themes):
+    merged = {}
+    for tags in themes.values():
+        for key, values in tags.items():
+            if values is True or merged.get(key) is True:
+                merged[key] = True
+            else:
+                values = [values] if isinstance(values, str) else list(values)
+                merged[key] = merged.get(key, []) + [v for v in values if v not in merged.get(key, [])]
+    return merged
+
+### helper to find the features matching at least one tag (same rules as the osm query)
+def match_tags(gdf,tags):
+    mask = np.zeros(len(gdf), dtype=bool)
+    for key, values in tags.items():
+        if key not in gdf.columns:
+            continue
+        if values is True:
+            mask |= gdf[key].notna().values
+        elif isinstance(values, str):
+            mask |= (gdf[key] == values).values
+        else:
+            mask |= gdf[key].isin(values).values
+    return mask
+
+### helper to bring osm geometries into the layer layout -> indexed by geom_type, short column names, no lines
+def clean_osm_gdf(gdf):
+    if 'nodes' in gdf.columns:
+        gdf = gdf.reset_index().drop(columns=['osmid','nodes']).copy() #reindex and delete useless data / drop all columns with >1 nan value
+    else:
+        gdf = gdf.reset_index().drop(columns=['osmid']).copy()
+    gdf = gdf.rename(columns={'element_type': "geom_type"})
+    gdf = gdf.set_index('geom_type')
+    gdf = gdf.rename(columns={'nature_reserve': "Nreserve"})
+    gdf = gdf.rename(columns={'village_green': "VillGreen"})
+    gdf = gdf.rename(columns={'recreation_ground': "recreation"})
+    gdf = gdf[~ (gdf.geometry.geom_type == 'LineString')]
+    return gdf
+
 ### helper to save osm data -> nodes and ways/relations are saved in two different files as requiered by the esri shapfile format
 def save(layer_name,gdf,tag_lst):
     dir_name = make_dir()
@@ -94,8 +168,9 @@ def save(layer_name,gdf,tag_lst):
         points = gdf.loc['node']
         points[check_cols(points,tag_lst)].dropna(how='all',axis = 1).to_file(f'{dir_name}/{layer_name}_{point_präfix}.shp', driver='ESRI Shapefile')
         types.remove('node')
-        polygons = gdf.loc["".join(map(str,types))]
-        polygons[check_cols(polygons,tag_lst)].dropna(how='all',axis = 1).to_file(f'{dir_name}/{layer_name}_{polygon_präfix}.shp', driver='ESRI Shapefile')
+        if len(types) > 0: # a theme can consist of nodes only
+            polygons = gdf.loc["".join(map(str,types))]
+            polygons[check_cols(polygons,tag_lst)].dropna(how='all',axis = 1).to_file(f'{dir_name}/{layer_name}_{polygon_präfix}.shp', driver='ESRI Shapefile')
 
 ### helper to check tag existence in osm data
 def check_cols(gdf, tag_lst):
@@ -107,9 +182,9 @@ def check_cols(gdf, tag_lst):
 def make_dir(dirName='Gis_layers'):
     try:
         os.mkdir(dirName)
-        print("Directory " , dirName ,  " Created ")
+        log.info(f"Directory {dirName} Created")
     except FileExistsError:
-        print("Directory " , dirName ,  " already exists")
+        log.info(f"Directory {dirName} already exists")
     return dirName
 
 ###helper to check if street graph is valid
@@ -121,9 +196,7 @@ def is_valid(G):
     
 ### helper to convert gdf of polygons to center point
 def poly_to_centroid(data):
-    data = ox.project_gdf(data)
-    data['geometry'] = data.centroid
-    data = data.to_crs('epsg:4326')
+    data = data.set_geometry(projection.centroids(data.geometry.values,data.crs)).to_crs('epsg:4326')
     data.reset_index(inplace=True)
     data['geom_type'] = 'node'
     data = data.set_index('geom_type',drop=True)
@@ -138,39 +211,50 @@ def compose(G,G2):
     elif G2 != None:
         composed = G2
     else:
-        print("error no graph is valid")
+        log.warning("error no graph is valid")
         composed = None
     return composed
 
 
 ####### loading functions #####
 
+### read a layer from disc -> served from the layer store if the shapefile was converted with layer_store.build_layer_store
+def read_layer(path,bbox=None):
+    with stage('file_io.read_layer') as s:
+        if layer_store.has_store(path):
+            data = layer_store.read_layer(path,bbox=bbox)
+        else:
+            data = gpd.read_file(path,bbox=bbox)
+        s.count(features=len(data))
+    return data
+
 ### load graph in bbox from disc
 def load_graph_in_bbox(path,point,dist=2000):
     buff = gu.create_point_buffer(point,dist) 
     buff_proj = buff.to_crs("epsg:4326")
-    nodes = gpd.read_file(f"{path}/nodes.shp",bbox=buff_proj).set_index('osmid',drop=True)
-    edges = gpd.read_file(f"{path}/edges.shp",bbox=buff_proj).set_index(['u','v','key'],drop=True)
-    G = ox.utils_graph.graph_from_gdfs(nodes, edges)
+    return load_graph_in_bounds(path,buff_proj)
+
+### load graph in bbox (gdf or (minx,miny,maxx,maxy) in wgs84) from disc
+def load_graph_in_bounds(path,bbox):
+    with stage('graph_load.load_graph_in_bounds') as s:
+        G = _load_graph_in_bounds(path,bbox)
+        if s and G is not None:
+            s.count(nodes=len(G), edges=G.number_of_edges())
+    return G
+
+def _load_graph_in_bounds(path,bbox):
+    if graph_arrays.is_columnar(path):
+        if not isinstance(bbox, tuple):
+            bbox = tuple(bbox.to_crs('epsg:4326').total_bounds)
+        G = graph_arrays.read_columnar_graph(path,bounds=bbox)
+        return G if is_valid(G) else None
+    nodes = read_layer(f"{path}/nodes.shp",bbox=bbox).set_index('osmid',drop=True)
+    edges = read_layer(f"{path}/edges.shp",bbox=bbox).set_index(['u','v','key'],drop=True)
+    # keep only edges with both end nodes in the bbox -> no attribute-less nodes end up in the graph
+    inside = edges.index.get_level_values('u').isin(nodes.index) & edges.index.get_level_values('v').isin(nodes.index)
+    G = ox.utils_graph.graph_from_gdfs(nodes, edges[inside])
     if is_valid(G):
-        node,data = zip(*G.nodes(data=True))
-        newdata = []
-        geom=[]
-        newn = []
-        for i,d in enumerate(data):
-            if bool(d):
-                newn.append(node[i])
-                newdata.append(d)
-                geom.append(Point(d['x'],d['y']) )
-        newdata = tuple(newdata)
-        gdf_nodes = gpd.GeoDataFrame(newdata,index=newn,crs='epsg:4326',geometry=geom)
-        gdf_nodes.index.rename("osmid", inplace=True)
-        i = gdf_nodes.index
-        sub = G.subgraph(i)
-        if is_valid(sub):
-            return sub
-        else:
-            return None
+        return G
     else:
         return None
 
@@ -178,36 +262,50 @@ def load_graph_in_bbox(path,point,dist=2000):
 def load_data_around_home(path,point,dist=500):
     buff = gu.create_point_buffer(point,dist) 
     buff_proj = buff.to_crs('epsg:4326')
-    data = gpd.read_file(path,bbox=buff_proj).set_index('geom_type',drop=True)
+    data = read_layer(path,bbox=buff_proj).set_index('geom_type',drop=True)
     return data
 
 ###load osm data in bbox form disc
 def load_data_in_bbox(path,bbox=None,all_data=True):
     if all_data == True:
-        data = gpd.read_file(path).set_index('geom_type',drop=True)
+        data = read_layer(path).set_index('geom_type',drop=True)
     else:
         if bbox.crs !=  "epsg:4326":
             bbox = bbox.to_crs('epsg:4326')
-        data = gpd.read_file(path,bbox=bbox).set_index('geom_type',drop=True)
+        data = read_layer(path,bbox=bbox).set_index('geom_type',drop=True)
     return data
 
 ### load graph from from disc in pickle format
-def load_graph_from_pickle(home,dist=1000):
-    G = nx.read_gpickle('Gis_layers/roads_walk_Berlin_Havelland.pkl')
-    nodes = ox.graph_to_gdfs(G, edges=False)
+### -> reads only the needed tiles if the pickle was converted with graph_store.build_graph_store_from_pickle
+###    or store_path is a graph in the columnar format (convert_G(...,columnar=True))
+def load_graph_from_pickle(home,dist=1000,pickle_path='Gis_layers/roads_walk_Berlin_Havelland.pkl',store_path='Gis_layers/roads_walk_Berlin_Havelland_tiles'):
     buff = gu.create_point_buffer(home,dist) 
     buff_proj = buff.to_crs("epsg:4326")
-    intersecting_nodes = nodes[nodes.intersects(buff_proj['geometry'][0])].index
-    G_sub = G.subgraph(intersecting_nodes)
-    del G
+    with stage('graph_load.load_graph_from_pickle') as s:
+        G_sub = _load_subgraph(buff_proj['geometry'][0],pickle_path,store_path)
+        if s:
+            s.count(nodes=len(G_sub), edges=G_sub.number_of_edges())
     if is_valid(G_sub):
-        G_simple = ox.simplification.simplify_graph(G_sub)
-        buff_area = buff['geometry'][0].area
-        return_tuple =  (ox.utils_graph.get_largest_component(G_sub), ox.basic_stats(G_simple,buff_area) )
-        return_tuple[1]["intersection_3_way_density_km"] = ox.stats.intersection_count(G=G_simple, min_streets=3) / (buff_area / 1_000_000)
+        with stage('graph_load.simplify_stats'):
+            G_simple = ox.simplification.simplify_graph(G_sub)
+            buff_area = buff['geometry'][0].area
+            return_tuple =  (ox.utils_graph.get_largest_component(G_sub), ox.basic_stats(G_simple,buff_area) )
+            return_tuple[1]["intersection_3_way_density_km"] = ox.stats.intersection_count(G=G_simple, min_streets=3) / (buff_area / 1_000_000)
         return return_tuple
     else:
         return None, None
+
+### subgraph of the nodes inside polygon from the columnar graph, the tile store or the full pickle
+def _load_subgraph(polygon,pickle_path,store_path):
+    if graph_arrays.is_columnar(store_path):
+        return graph_arrays.read_columnar_graph(store_path,polygon=polygon)
+    if os.path.exists(f"{store_path}/index.json"):
+        return graph_store.load_subgraph_in_polygon(store_path,polygon)
+    with open(pickle_path, 'rb') as f:  # networkx 3 has no read_gpickle
+        G = pickle.load(f)
+    nodes = ox.graph_to_gdfs(G, edges=False)
+    intersecting_nodes = nodes[nodes.intersects(polygon)].index
+    return G.subgraph(intersecting_nodes)
 #################################
 #### how to download and save ###
 #################################
@@ -215,6 +313,7 @@ def load_graph_from_pickle(home,dist=1000):
 # convert_G('roads_walk_Havelland.pkl',subfolder_path='roads_Havelland')
 # get_osm_for_place(citys,green_tags,layer_name='Green_layer_berlinHavelland')
 # convert_G('roads_walk_Berlin.pkl',subfolder_path='roads_Berlin')
+# get_osm_for_themes(citys,themes)
 
 ########################
 #### how to load #######
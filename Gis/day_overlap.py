@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+import projection
+from instrumentation import stage
+
+CAPACITY = 64
+
+### union of all other hulls that overlap a hull -> only hulls with overlapping bboxes are combined
+### (empty polygon if nothing overlaps), day / other are the overlapping pairs if already known
+def other_unions(geoms,day=None,other=None):
+    #### no shapely.prepare: the tree query prepares each hull for its own predicate tests and nothing else reuses them
+    if day is None:
+        day, other = shapely.STRtree(geoms).query(geoms, predicate='intersects')
+        keep = day != other
+        day, other = day[keep], other[keep]
+    #### group hulls that are connected through overlaps, hulls outside a group never touch its members
+    labels = np.arange(len(geoms))
+    while True:
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, day, labels[other])
+        if (new_labels == labels).all():
+            break
+        labels = new_labels
+    unions = np.array([shapely.Polygon()] * len(geoms), dtype=object)
+    for label in np.unique(labels[day]):
+        members = np.flatnonzero(labels == label)
+        #### union of all other members via prefix and suffix unions -> one union per hull instead of one per pair
+        prefix, suffix = [None], [None]
+        for i in members:
+            prefix.append(geoms[i] if prefix[-1] is None else shapely.union(prefix[-1], geoms[i]))
+        for i in members[::-1]:
+            suffix.append(geoms[i] if suffix[-1] is None else shapely.union(suffix[-1], geoms[i]))
+        suffix = suffix[::-1]
+        for pos, i in enumerate(members):
+            unions[i] = shapely.union_all([g for g in (prefix[pos], suffix[pos + 1]) if g is not None])
+    return unions
+
+
+##### incremental overlap state of the daily convex hulls of one participant #####
+### per day: projected hull, bounds, area and the union of the overlapping other days, per day pair: intersection area
+### (None until intersection_matrix is called for pairs that come from from_geoms)
+### a new day is only intersected with the days whose bounds overlap its own -> re-scoring after a day is O(days)
+class DayOverlapIndex:
+    def __init__(self, proj=None):
+        self.proj = proj
+        self.days = []
+        self.slots = {}
+        self.pairs = {}
+        self.hull = None
+        self._geoms = np.empty(CAPACITY, dtype=object)
+        self._others = np.empty(CAPACITY, dtype=object)
+        self._bounds = np.empty((CAPACITY, 4))
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def geoms(self):
+        return self._geoms[:len(self)]
+
+    ### part of each day covered by other days, clipped on demand -> clipping on every add piles up vertices on the hull edges
+    @property
+    def covered(self):
+        return shapely.intersection(self.geoms, self.others)
+
+    @property
+    def others(self):
+        return self._others[:len(self)]
+
+    @property
+    def bounds(self):
+        return self._bounds[:len(self)]
+
+    @property
+    def areas(self):
+        return shapely.area(self.geoms)
+
+    ### index of already projected hulls, built in one pass ###
+    @classmethod
+    def from_geoms(cls,days,geoms,proj=None):
+        index = cls(proj)
+        geoms = np.asarray(geoms, dtype=object)
+        index._reserve(len(geoms))
+        index._geoms[:len(geoms)] = geoms
+        index._bounds[:len(geoms)] = shapely.bounds(geoms)
+        index.days = list(days)
+        index.slots = {d: i for i, d in enumerate(index.days)}
+        with stage('overlay.day_overlap_index', days=len(geoms)):
+            day, other = shapely.STRtree(geoms).query(geoms, predicate='intersects')
+            keep = day != other
+            day, other = day[keep], other[keep]
+            index._others[:len(geoms)] = other_unions(geoms,day,other)
+            #### pair areas are not needed for the indicators -> computed when the matrix is asked for
+            upper = day < other
+            for i, j in zip(day[upper].tolist(), other[upper].tolist()):
+                index._set_pair(i,j,None)
+        index.hull = index._convex_hull(geoms)
+        return index
+
+    ### same input as geo_utils.RevisitedLS (daily hulls in wgs84, dates) ###
+    @classmethod
+    def from_gdf(cls,convex_hulls_gdf,dates,proj=None):
+        gdf_p = projection.project_gdf(convex_hulls_gdf,to_crs=proj)
+        return cls.from_geoms(dates,np.asarray(gdf_p.geometry.values),gdf_p.crs)
+
+    ### new days of an ongoing participant (hulls in wgs84) -> projected like the days before ###
+    def append(self,convex_hulls_gdf,dates):
+        if self.proj is None:
+            self.proj = projection.estimate_utm_crs(np.asarray(convex_hulls_gdf.geometry.values),convex_hulls_gdf.crs)
+        geoms = projection.transform_geoms(np.asarray(convex_hulls_gdf.geometry.values),convex_hulls_gdf.crs,self.proj)
+        with stage('overlay.day_overlap_append', days=len(geoms)):
+            for day, geom in zip(dates, geoms):
+                self.add(day,geom)
+        return self
+
+    ### one projected hull, a day that is already indexed (e.g. a partial day) is replaced ###
+    def add(self,day,geom):
+        replaced = day in self.slots
+        if replaced:
+            i = self.slots[day]
+            self._drop_pairs(i)
+        else:
+            i = len(self)
+            self._reserve(i + 1)
+            self.days.append(day)
+            self.slots[day] = i
+        self._geoms[i] = geom
+        self._bounds[i] = shapely.bounds(geom)
+        #### candidates from the bounds array, one vectorized intersection with all of them
+        b = self._bounds[i]
+        bounds = self.bounds
+        candidates = np.flatnonzero((bounds[:, 0] <= b[2]) & (bounds[:, 2] >= b[0]) & (bounds[:, 1] <= b[3]) & (bounds[:, 3] >= b[1]))
+        candidates = candidates[candidates != i]
+        #### same predicate as from_geoms -> touching days are pairs as well (with area 0)
+        candidates = candidates[shapely.intersects(geom, self._geoms[candidates])]
+        areas = shapely.area(shapely.intersection(geom, self._geoms[candidates]))
+        for j, a in zip(candidates.tolist(), areas.tolist()):
+            self._set_pair(i,j,a)
+        self._others[candidates] = shapely.union(self._others[candidates], geom)
+        self._others[i] = shapely.union_all(self._geoms[candidates]) if len(candidates) else shapely.Polygon()
+        #### the overall hull only grows on append, a replaced day may shrink it
+        if replaced or self.hull is None:
+            self.hull = self._convex_hull(self.geoms)
+        else:
+            self.hull = self._convex_hull([self.hull, geom])
+        return self
+
+    #### pairs of a replaced day are removed, the unions of its partners are rebuilt from their other pairs
+    def _drop_pairs(self,i):
+        for j in self.pairs.pop(i, {}):
+            del self.pairs[j][i]
+            others = self._geoms[list(self.pairs[j])]
+            self._others[j] = shapely.union_all(others) if len(others) else shapely.Polygon()
+
+    def _set_pair(self,i,j,area):
+        self.pairs.setdefault(i, {})[j] = area
+        self.pairs.setdefault(j, {})[i] = area
+
+    def _reserve(self,n):
+        if n <= len(self._geoms):
+            return
+        size = max(n, 2 * len(self._geoms))
+        for name in ('_geoms', '_others'):
+            grown = np.empty(size, dtype=object)
+            grown[:len(self)] = getattr(self, name)[:len(self)]
+            setattr(self, name, grown)
+        grown = np.empty((size, 4))
+        grown[:len(self)] = self._bounds[:len(self)]
+        self._bounds = grown
+
+    @staticmethod
+    def _convex_hull(geoms):
+        return shapely.convex_hull(shapely.multipoints(shapely.get_coordinates(np.asarray(geoms, dtype=object))))
+
+    #################### indicators from the stored state ###########
+
+    ### share of each day covered by the other days (see geo_utils.RevisitedLS) ###
+    ### days without area (points, lines left in the hulls) have no covered share -> 0
+    def revisited_ratios(self):
+        areas = self.areas
+        ratios = np.zeros(len(areas))
+        np.divide(shapely.area(self.covered), areas, out=ratios, where=areas > 0)
+        return ratios
+
+    def revisited_ls(self):
+        s = pd.Series(self.revisited_ratios(), index=self.days)
+        return round(s * 100,3)
+
+    ### share of the overall convex hull taken by each day (see geo_utils.day_convex_overlapping) ###
+    ### every daily hull lies inside the overall hull -> the intersection is the daily hull itself
+    def day_convex_overlapping(self):
+        s = pd.Series(self.areas / self.hull.area, index=self.days)
+        return round(s * 100,2)
+
+    ### days x days intersection areas, daily hull areas on the diagonal ###
+    def intersection_matrix(self):
+        missing = [(i, j) for i, partners in self.pairs.items() for j, a in partners.items() if a is None and i < j]
+        if missing:
+            i, j = np.array(missing).T
+            for a, b, area in zip(i.tolist(), j.tolist(), shapely.area(shapely.intersection(self._geoms[i], self._geoms[j])).tolist()):
+                self._set_pair(a,b,area)
+        matrix = np.zeros((len(self), len(self)))
+        for i, partners in self.pairs.items():
+            matrix[i, list(partners)] = list(partners.values())
+        np.fill_diagonal(matrix, self.areas)
+        return pd.DataFrame(matrix, index=self.days, columns=self.days)
@@ -3,7 +3,10 @@ import pandas as pd
 import numpy as np
 import datetime
 import shapely
-import osmnx as ox
+import projection
+from day_overlap import DayOverlapIndex
+from instrumentation import stage
+from shapely.geometry import Point
 
 
 ### convert df to gdf
@@ -19,44 +22,52 @@ def gdf_from_df(df,lat_lon_col_names):
 
 ### get dates and convex hull for each day
 def create_convex_hulls(gdf):
-    dates = np.unique(np.array(gdf.index))
-    #### create empty gdf #####
-    convex_hulls_gdf = gpd.GeoDataFrame()
-    #### filter by day and add convex hull per day
-    convex_hulls = []
-    for day in dates:
-        try:
-            d = gdf.loc[day,:]
-            convex_hulls.append(d.unary_union.convex_hull)
-        except:
-            print(f"{d} at {day} just one sample")
-            d = gdf.loc[[day]]
-            convex_hulls.append(d.unary_union.convex_hull)
+    coords = shapely.get_coordinates(gdf.geometry.values)
+    # sort on datetime64 days instead of datetime.date objects, dates are handed back as datetime.date
+    if 'tracked_at_date' in gdf.columns:
+        times = pd.to_datetime(gdf['tracked_at_date'])
+        if times.dt.tz is not None:
+            times = times.dt.tz_localize(None)  # local day like the date index of gdf_from_df, not the utc day
+        days = times.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+    else:
+        days = np.array(gdf.index, dtype='datetime64[D]')
+    with stage('buffer_union.convex_hulls', points=len(coords)) as s:
+        convex_hulls, dates = convex_hulls_from_arrays(coords[:, 0], coords[:, 1], days)
+        s.count(days=len(dates))
+    dates = dates.astype(object)
     ##### save convex hulls in gdf
-    convex_hulls_gdf['geometry'] = convex_hulls
-    convex_hulls_gdf = convex_hulls_gdf.set_crs('epsg:4326') #set to wsg84 (lon,lat)
+    convex_hulls_gdf = gpd.GeoDataFrame(geometry=convex_hulls, crs='epsg:4326') #set to wsg84 (lon,lat)
     convex_hulls_gdf = convex_hulls_gdf.set_index(dates) #set dates as index again
     return convex_hulls_gdf,dates
 
+### convex hull per day straight from the point coordinates -> sort by day once, no union of geometries
+def convex_hulls_from_arrays(x,y,days):
+    order = np.argsort(days, kind='stable')
+    coords = np.column_stack([np.asarray(x, dtype=float)[order], np.asarray(y, dtype=float)[order]])
+    dates, starts, counts = np.unique(np.asarray(days)[order], return_index=True, return_counts=True)
+    convex_hulls = np.empty(len(dates), dtype=object)
+    #### one sample -> point, two samples -> line (or point if both are equal)
+    one = counts == 1
+    convex_hulls[one] = shapely.points(coords[starts[one]])
+    two = counts == 2
+    first, second = coords[starts[two]], coords[starts[two] + 1]
+    same = (first == second).all(axis=1)
+    pairs = np.empty(len(first), dtype=object)
+    pairs[same] = shapely.points(first[same])
+    pairs[~same] = shapely.linestrings(np.stack([first[~same], second[~same]], axis=1))
+    convex_hulls[two] = pairs
+    #### three or more samples -> convex hull of one multipoint per day
+    many = counts > 2
+    if many.any():
+        in_many = np.repeat(many, counts)
+        indices = np.repeat(np.arange(many.sum()), counts[many])
+        convex_hulls[many] = shapely.convex_hull(shapely.multipoints(coords[in_many], indices=indices))
+    return convex_hulls,dates
+
 
 ### calculate ptc of overlapping convex hull per day 
 def RevisitedLS(convex_hulls_gdf,dates,proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
-    gdf_p = gdf_p.set_index(dates)
-    ptc = []
-    ### intersection of day x with all other days ####
-    for day in dates:
-        day_of_interest = gdf_p.loc[[day]]
-        other_days = gdf_p.loc[gdf_p.index != day, :]
-        inter = gpd.overlay(day_of_interest, other_days, how='intersection')
-        # inter = inter.set_index(dates[dates != day])
-        if len(inter) != 0:
-            ptc_day = inter.unary_union.area / day_of_interest.unary_union.area
-        else:
-            ptc_day = 0
-        ptc.append(ptc_day)
-    s = pd.Series(ptc,index=dates)
-    return round(s * 100,3)
+    return DayOverlapIndex.from_gdf(convex_hulls_gdf,dates,proj).revisited_ls()
 
 ### check if convex_hull plygon is a valid polygon ... else remove it
 def check_samples(df,date_df):
@@ -76,42 +87,29 @@ def check_samples(df,date_df):
         return df,date_df,np.unique(np.array(df.index))
 
 def CHull_skm(convex_hulls_gdf,proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
+    gdf_p = projection.project_gdf(convex_hulls_gdf,to_crs=proj)
     return gdf_p.unary_union.convex_hull.area / 1e6
 
 def CHull_skm_daily(convex_hulls_gdf,proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
+    gdf_p = projection.project_gdf(convex_hulls_gdf,to_crs=proj)
     return gdf_p.area / 1e6
 
 ### return compactness of lifespace 
 def GravCompact(convex_hulls_gdf,proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
+    gdf_p = projection.project_gdf(convex_hulls_gdf,to_crs=proj)
     A = gdf_p.unary_union.convex_hull.area
     P = gdf_p.unary_union.convex_hull.length
     return P / (2*np.sqrt(np.pi*A))
 
 ### return compactness of lifespace per day 
 def GravCompact_daily(convex_hulls_gdf,proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
+    gdf_p = projection.project_gdf(convex_hulls_gdf,to_crs=proj)
     A = gdf_p.area
     P = gdf_p.length
     return P / (2*np.sqrt(np.pi*A))
 
 def day_convex_overlapping(convex_hulls_gdf,dates, proj=None):
-    gdf_p = ox.project_gdf(convex_hulls_gdf,to_crs=proj)
-    gdf_p = gdf_p.set_index(dates)
-    ## build gdf form projected gdf union convex hull geometry
-    overall_convex_hull = gpd.GeoSeries(gdf_p.unary_union.convex_hull)
-    overall_convex_hull_df = gpd.GeoDataFrame(geometry=overall_convex_hull).set_crs(gdf_p.crs)
-    ptc = []
-    for day in dates:
-        inter = gpd.overlay(gdf_p.loc[[day]], overall_convex_hull_df, how='intersection',keep_geom_type=False)
-        if len(inter) != 0:
-            ptc.append(inter.unary_union.area / overall_convex_hull_df.area[0])
-        else:
-            ptc.append(0)
-    s = pd.Series(ptc,index=dates)
-    return round(s * 100,2)
+    return DayOverlapIndex.from_gdf(convex_hulls_gdf,dates,proj).day_convex_overlapping()
 
 ## helper for overlay combine gdf to unary_union polygon and return as gdf
 def polygon_to_gdf(gdf_p,proj):
@@ -122,17 +120,20 @@ def polygon_to_gdf(gdf_p,proj):
 
 def spatial_overlays(buffer,geo_df,how='intersection',merge_polygon=True):
     if geo_df.crs == None or geo_df.crs != buffer.crs:
-        geo_df_proj = ox.project_gdf(geo_df,to_crs=buffer.crs) #make sure both are in the same crs
+        geo_df_proj = projection.project_gdf(geo_df,to_crs=buffer.crs) #make sure both are in the same crs
     else:
         geo_df_proj = geo_df
-    if merge_polygon == True:
-        overlay = gpd.overlay(buffer,polygon_to_gdf(geo_df_proj,geo_df_proj.crs),how=how,keep_geom_type=False)
-    else:
-        overlay = gpd.overlay(buffer,geo_df_proj,how=how,keep_geom_type=False) # only use if df2 are same geomety types for sure
+    with stage('overlay.spatial_overlays', features=len(geo_df_proj), buffers=len(buffer)):
+        if merge_polygon == True:
+            overlay = gpd.overlay(buffer,polygon_to_gdf(geo_df_proj,geo_df_proj.crs),how=how,keep_geom_type=False)
+        else:
+            overlay = gpd.overlay(buffer,geo_df_proj,how=how,keep_geom_type=False) # only use if df2 are same geomety types for sure
     return overlay
 
+### build wgs84 gdf from (lon,lat) point
+def build_geo_df(lon_lat):
+    return gpd.GeoDataFrame(geometry=[Point(lon_lat)],crs='epsg:4326')
+
 def create_point_buffer(lon_lat,dist,proj=None):
-    point = build_geo_df(lon_lat)
-    point_proj = ox.project_gdf(point,to_crs=proj)
-    buffer = gpd.GeoDataFrame(geometry=point_proj.buffer(dist)).set_crs(point_proj.crs)
-    return buffer
+    buffers, crs = projection.point_buffers([lon_lat[0]],[lon_lat[1]],dist,proj=proj)
+    return gpd.GeoDataFrame(geometry=buffers,crs=crs)
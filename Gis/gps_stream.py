@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+import geo_utils as gu
+from lifespace import LifespaceIndicators
+
+CHUNK_SIZE = 500_000
+
+### read a raw tracking export (csv or parquet) in bounded batches -> lon, lat and timestamp arrays per batch ###
+def iter_track_batches(path,lat_lon_col_names,time_col='tracked_at_date',chunksize=CHUNK_SIZE):
+    lat, lon = lat_lon_col_names[0], lat_lon_col_names[1]
+    columns = [lat, lon, time_col]
+    if str(path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        batches = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        batches = pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    for df in batches:
+        times = pd.to_datetime(df[time_col])
+        if times.dt.tz is not None:
+            times = times.dt.tz_localize(None)  # keep the local day like gdf_from_df does
+        yield df[lon].to_numpy(dtype=float), df[lat].to_numpy(dtype=float), times.to_numpy(dtype='datetime64[ns]')
+
+### points of one day at a time -> export has to be sorted by time, only the current day is held in memory ###
+def iter_days(path,lat_lon_col_names,time_col='tracked_at_date',chunksize=CHUNK_SIZE):
+    carry = None
+    for x, y, t in iter_track_batches(path,lat_lon_col_names,time_col,chunksize):
+        days = t.astype('datetime64[D]')
+        if carry is not None:
+            x, y, t, days = (np.concatenate([c, a]) for c, a in zip(carry, (x, y, t, days)))
+        bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(days)]])
+        #### the last day of a batch may continue in the next one
+        for start, end in zip(starts[:-1], ends[:-1]):
+            yield days[start].astype(object), x[start:end], y[start:end], t[start:end]
+        carry = (x[starts[-1]:], y[starts[-1]:], t[starts[-1]:], days[starts[-1]:])
+    if carry is not None and len(carry[0]):
+        yield carry[3][0].astype(object), carry[0], carry[1], carry[2]
+
+### convex hull per day updated batch by batch -> only the hull of a day is kept, input order does not matter ###
+class DailyHulls:
+    def __init__(self):
+        self.hulls = {}
+
+    def update(self,x,y,days):
+        hulls, dates = gu.convex_hulls_from_arrays(x,y,days)
+        for day, hull in zip(dates.tolist(), hulls):
+            prev = self.hulls.get(day)
+            if prev is not None:
+                coords = np.vstack([shapely.get_coordinates(prev), shapely.get_coordinates(hull)])
+                hull = gu.convex_hulls_from_arrays(coords[:, 0], coords[:, 1], np.zeros(len(coords)))[0][0]
+            self.hulls[day] = hull
+
+    ### same output as geo_utils.create_convex_hulls
+    def to_gdf(self):
+        dates = np.array(sorted(self.hulls), dtype=object)
+        convex_hulls_gdf = gpd.GeoDataFrame(geometry=[self.hulls[d] for d in dates], crs='epsg:4326')
+        convex_hulls_gdf = convex_hulls_gdf.set_index(dates)
+        return convex_hulls_gdf,dates
+
+### daily convex hulls straight from a tracking export, peak memory is one batch
+def convex_hulls_from_file(path,lat_lon_col_names,time_col='tracked_at_date',chunksize=CHUNK_SIZE):
+    daily = DailyHulls()
+    for x, y, t in iter_track_batches(path,lat_lon_col_names,time_col,chunksize):
+        daily.update(x,y,t.astype('datetime64[D]'))
+    return daily.to_gdf()
+
+### all lifespace indicators of a user from a tracking export
+def lifespace_from_file(path,lat_lon_col_names,time_col='tracked_at_date',chunksize=CHUNK_SIZE,proj=None):
+    convex_hulls_gdf, dates = convex_hulls_from_file(path,lat_lon_col_names,time_col,chunksize)
+    convex_hulls_gdf, _, dates = gu.check_samples(convex_hulls_gdf,pd.DataFrame(index=dates))
+    return LifespaceIndicators(convex_hulls_gdf,dates,proj=proj).all()
@@ -0,0 +1,303 @@
+import json
+import os
+
+import numpy as np
+import shapely
+
+from _lazy import lazy_import
+
+nx = lazy_import('networkx')
+
+COLUMNAR_FORMAT = 'graph-columnar'
+TILE_SIZE = 0.02  # degrees
+NODE_ATTRS = ('street_count',)
+EDGE_ATTRS = ('osmid', 'oneway', 'highway')
+
+
+### array backed street graph: node ids + coordinates and edges sorted by source node (CSR) ###
+class GraphArrays:
+    def __init__(self, node_ids, x, y, u, v, key, length, time=None, geom_wkb=None, geom_offsets=None, crs=None, node_attrs=None, edge_attrs=None):
+        # u,v are positions into node_ids, edges have to be sorted by u
+        self.node_ids = np.asarray(node_ids)
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.u = np.asarray(u, dtype=np.int64)
+        self.v = np.asarray(v, dtype=np.int64)
+        self.key = np.asarray(key, dtype=np.int64)
+        self.length = np.asarray(length, dtype=float)
+        self.time = None if time is None else np.asarray(time, dtype=float)
+        # all edge geometries as one wkb byte buffer, edge i is geom_wkb[geom_offsets[i]:geom_offsets[i+1]] (empty -> no geometry)
+        self.geom_wkb = np.zeros(0, dtype=np.uint8) if geom_wkb is None else np.asarray(geom_wkb, dtype=np.uint8)
+        self.geom_offsets = np.zeros(len(self.u) + 1, dtype=np.int64) if geom_offsets is None else np.asarray(geom_offsets, dtype=np.int64)
+        self.crs = crs
+        # further attributes as name -> array, strings as object arrays (None -> attribute missing)
+        self.node_attrs = {} if node_attrs is None else node_attrs
+        self.edge_attrs = {} if edge_attrs is None else edge_attrs
+        self.indptr = np.searchsorted(self.u, np.arange(len(self.node_ids) + 1))
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def n_edges(self):
+        return len(self.u)
+
+    ### position of node ids in the node arrays ###
+    def node_index(self, ids):
+        order = np.argsort(self.node_ids, kind='stable')
+        pos = np.searchsorted(self.node_ids, ids, sorter=order)
+        return order[np.clip(pos, 0, len(order) - 1)]
+
+    ### edge geometries as shapely objects (None where the edge has no geometry) ###
+    def edge_geometries(self, edges=None):
+        edges = np.arange(self.n_edges) if edges is None else np.asarray(edges)
+        geoms = np.empty(len(edges), dtype=object)
+        buf = self.geom_wkb.tobytes()
+        for j, i in enumerate(edges):
+            start, end = self.geom_offsets[i], self.geom_offsets[i + 1]
+            if end > start:
+                geoms[j] = shapely.from_wkb(buf[start:end])
+        return geoms
+
+    ### build from a networkx multigraph, keeps x/y, length, time, geometry and the listed attributes ###
+    @classmethod
+    def from_networkx(cls, G, node_attrs=(), edge_attrs=()):
+        node_ids = np.array(list(G.nodes))
+        pos = {n: i for i, n in enumerate(node_ids.tolist())}
+        x = np.fromiter((d['x'] for _, d in G.nodes(data=True)), dtype=float, count=len(node_ids))
+        y = np.fromiter((d['y'] for _, d in G.nodes(data=True)), dtype=float, count=len(node_ids))
+        n_attrs = {name: _attr_array([d.get(name) for _, d in G.nodes(data=True)]) for name in node_attrs}
+        u, v, key, length, time, wkb = [], [], [], [], [], []
+        e_attrs = {name: [] for name in edge_attrs}
+        has_time = True
+        for a, b, k, d in G.edges(keys=True, data=True):
+            u.append(pos[a])
+            v.append(pos[b])
+            key.append(k)
+            length.append(d.get('length', np.nan))
+            if 'time' in d:
+                time.append(d['time'])
+            else:
+                has_time = False
+            geom = d.get('geometry')
+            wkb.append(b'' if geom is None else shapely.to_wkb(geom))
+            for name in edge_attrs:
+                e_attrs[name].append(d.get(name))
+        u = np.array(u, dtype=np.int64)
+        order = np.argsort(u, kind='stable')
+        wkb = [wkb[i] for i in order]
+        offsets = np.zeros(len(wkb) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(b) for b in wkb])
+        geom_wkb = np.frombuffer(b''.join(wkb), dtype=np.uint8)
+        time = np.array(time, dtype=float)[order] if has_time and len(time) else None
+        e_attrs = {name: _attr_array(values)[order] for name, values in e_attrs.items()}
+        return cls(node_ids, x, y, u[order], np.array(v, dtype=np.int64)[order], np.array(key, dtype=np.int64)[order],
+                   np.array(length, dtype=float)[order], time=time, geom_wkb=geom_wkb, geom_offsets=offsets,
+                   crs=G.graph.get('crs'), node_attrs=n_attrs, edge_attrs=e_attrs)
+
+    ### rebuild a networkx MultiDiGraph as osmnx functions expect it ###
+    def to_networkx(self):
+        G = nx.MultiDiGraph(crs=self.crs)
+        ids = self.node_ids.tolist()
+        n_attrs = {name: values.tolist() for name, values in self.node_attrs.items()}
+        nodes = []
+        for i, (n, x, y) in enumerate(zip(ids, self.x.tolist(), self.y.tolist())):
+            data = {'x': x, 'y': y}
+            for name, values in n_attrs.items():
+                if values[i] is not None:
+                    data[name] = values[i]
+            nodes.append((n, data))
+        G.add_nodes_from(nodes)
+        geoms = self.edge_geometries()
+        length = self.length.tolist()
+        time = None if self.time is None else self.time.tolist()
+        e_attrs = {name: values.tolist() for name, values in self.edge_attrs.items()}
+        edges = []
+        for i, (a, b, k) in enumerate(zip(self.u.tolist(), self.v.tolist(), self.key.tolist())):
+            data = {'length': length[i]}
+            if time is not None:
+                data['time'] = time[i]
+            if geoms[i] is not None:
+                data['geometry'] = geoms[i]
+            for name, values in e_attrs.items():
+                if values[i] is not None:
+                    data[name] = values[i]
+            edges.append((ids[a], ids[b], k, data))
+        G.add_edges_from(edges)
+        return G
+
+    ### save as uncompressed npz so loading is a plain array read ###
+    ### further attributes as node_<name> / edge_<name>, object arrays as json strings ('' -> missing) since npz is read without pickle
+    def save(self, path):
+        arrays = dict(node_ids=self.node_ids, x=self.x, y=self.y, u=self.u, v=self.v, key=self.key,
+                      length=self.length, geom_wkb=self.geom_wkb, geom_offsets=self.geom_offsets,
+                      crs=np.array('' if self.crs is None else str(self.crs)))
+        if self.time is not None:
+            arrays['time'] = self.time
+        for prefix, attrs in (('node', self.node_attrs), ('edge', self.edge_attrs)):
+            for name, values in attrs.items():
+                if values.dtype == object:
+                    arrays[f"{prefix}_json_{name}"] = np.array(['' if v is None else _encode(v) for v in values], dtype=str)
+                else:
+                    arrays[f"{prefix}_attr_{name}"] = values
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            crs = str(data['crs']) or None
+            time = data['time'] if 'time' in data.files else None
+            attrs = {'node': {}, 'edge': {}}
+            for name in data.files:
+                prefix, kind, attr = (name.split('_', 2) + ['', ''])[:3]
+                if prefix in attrs and kind == 'attr':
+                    attrs[prefix][attr] = data[name]
+                elif prefix in attrs and kind == 'json':
+                    values = np.empty(len(data[name]), dtype=object)
+                    values[:] = [None if c == '' else json.loads(c) for c in data[name].tolist()]
+                    attrs[prefix][attr] = values
+            return cls(data['node_ids'], data['x'], data['y'], data['u'], data['v'], data['key'], data['length'],
+                       time=time, geom_wkb=data['geom_wkb'], geom_offsets=data['geom_offsets'], crs=crs,
+                       node_attrs=attrs['node'], edge_attrs=attrs['edge'])
+
+
+### attribute values as typed array: numbers stay numbers, everything else (strings, lists of merged osm ways) becomes an object array ###
+def _attr_array(values):
+    present = [v for v in values if v is not None]
+    if len(present) == len(values) and all(isinstance(v, (bool, np.bool_)) for v in present):
+        return np.array(values, dtype=bool)
+    if len(present) == len(values) and all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in present):
+        return np.array(values, dtype=np.int64)
+    if len(present) == len(values) and all(isinstance(v, (float, np.floating)) for v in present):
+        return np.array(values, dtype=float)
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+### one attribute value as json, values json does not know (e.g. geometries) are stored as str ###
+def _encode(value):
+    return json.dumps(value, default=_json_default)
+
+def _json_default(value):
+    return value.item() if isinstance(value, np.generic) else str(value)
+
+
+### byte ranges [starts, ends) of buf as one new buffer + offsets, gathered with one index array ###
+def _gather_bytes(buf, starts, ends):
+    lengths = np.asarray(ends - starts, dtype=np.int64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(lengths)
+    index = np.repeat(np.asarray(starts, dtype=np.int64) - offsets[:-1], lengths) + np.arange(offsets[-1])
+    return np.asarray(buf[index], dtype=np.uint8), offsets
+
+
+####### columnar graph format #######
+### a directory of .npy files (memory mapped on read): nodes and edges sorted by tile,
+### string attributes stored as category codes, edge geometries as one wkb buffer
+
+def is_columnar(path):
+    meta = f"{path}/meta.json"
+    if not os.path.exists(meta):
+        return False
+    with open(meta) as f:
+        return json.load(f).get('format') == COLUMNAR_FORMAT
+
+### write G in the columnar graph format ###
+def write_columnar_graph(G,path,tile_size=TILE_SIZE,node_attrs=NODE_ATTRS,edge_attrs=EDGE_ATTRS):
+    os.makedirs(path, exist_ok=True)
+    arrays = GraphArrays.from_networkx(G, node_attrs=node_attrs, edge_attrs=edge_attrs)
+    tx = np.floor(arrays.x / tile_size).astype(np.int64)
+    ty = np.floor(arrays.y / tile_size).astype(np.int64)
+    node_order = np.lexsort((tx, ty))
+    rank = np.empty_like(node_order)
+    rank[node_order] = np.arange(len(node_order))
+    #### edges follow their source node -> edges of a tile are one slice
+    edge_order = np.argsort(rank[arrays.u], kind='stable')
+    tiles, node_ptr = np.unique(np.column_stack([ty[node_order], tx[node_order]]), axis=0, return_index=True)
+    node_ptr = np.append(node_ptr, len(node_order))
+    edge_ptr = np.searchsorted(rank[arrays.u][edge_order], node_ptr)
+    meta = {'format': COLUMNAR_FORMAT, 'version': 2, 'crs': None if arrays.crs is None else str(arrays.crs),
+            'tile_size': tile_size, 'graph': G.graph, 'node_attrs': {}, 'edge_attrs': {}}
+    columns = {'node_id': arrays.node_ids[node_order], 'node_x': arrays.x[node_order], 'node_y': arrays.y[node_order],
+               'edge_u': arrays.node_ids[arrays.u[edge_order]], 'edge_v': arrays.node_ids[arrays.v[edge_order]],
+               'edge_key': arrays.key[edge_order], 'edge_length': arrays.length[edge_order],
+               'tiles': tiles[:, ::-1], 'tile_node_ptr': node_ptr, 'tile_edge_ptr': edge_ptr}
+    for prefix, attrs, order in (('node', arrays.node_attrs, node_order), ('edge', arrays.edge_attrs, edge_order)):
+        for name, values in attrs.items():
+            values = values[order]
+            if values.dtype == object:
+                #### categories are json encoded values -> lists, numbers, bools and strings come back as they were
+                encoded = [None if v is None else _encode(v) for v in values]
+                categories = sorted({c for c in encoded if c is not None})
+                lookup = {c: i for i, c in enumerate(categories)}
+                columns[f"{prefix}_{name}"] = np.array([-1 if c is None else lookup[c] for c in encoded], dtype=np.int32)
+                meta[f"{prefix}_attrs"][name] = categories
+            else:
+                columns[f"{prefix}_{name}"] = values
+                meta[f"{prefix}_attrs"][name] = None
+    columns['edge_geom_wkb'], columns['edge_geom_offsets'] = _gather_bytes(arrays.geom_wkb, arrays.geom_offsets[edge_order], arrays.geom_offsets[edge_order + 1])
+    for name, values in columns.items():
+        np.save(f"{path}/{name}.npy", values)
+    with open(f"{path}/meta.json", 'w') as f:
+        json.dump(meta, f, default=_json_default)  # graph metadata keeps bools and numbers, other objects (e.g. a crs) become strings
+
+### read the columnar graph -> all of it, or only the tiles touching bounds / polygon (wgs84) ###
+def read_columnar_graph(path,bounds=None,polygon=None,as_arrays=False):
+    with open(f"{path}/meta.json") as f:
+        meta = json.load(f)
+    col = lambda name: np.load(f"{path}/{name}.npy", mmap_mode='r')
+    if polygon is not None:
+        bounds = polygon.bounds
+    node_ptr, edge_ptr = col('tile_node_ptr'), col('tile_edge_ptr')
+    if bounds is None:
+        node_sel, edge_sel = np.arange(node_ptr[-1]), np.arange(edge_ptr[-1])
+    else:
+        minx, miny, maxx, maxy = bounds
+        size = meta['tile_size']
+        tiles = col('tiles')
+        hit = np.flatnonzero((tiles[:, 0] >= np.floor(minx / size)) & (tiles[:, 0] <= np.floor(maxx / size)) &
+                             (tiles[:, 1] >= np.floor(miny / size)) & (tiles[:, 1] <= np.floor(maxy / size)))
+        node_sel = np.concatenate([np.arange(node_ptr[t], node_ptr[t + 1]) for t in hit] + [np.zeros(0, dtype=np.int64)])
+        edge_sel = np.concatenate([np.arange(edge_ptr[t], edge_ptr[t + 1]) for t in hit] + [np.zeros(0, dtype=np.int64)])
+    ids, x, y = col('node_id')[node_sel], col('node_x')[node_sel], col('node_y')[node_sel]
+    if polygon is not None:
+        keep = shapely.intersects_xy(polygon, x, y)
+    elif bounds is not None:
+        keep = (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)
+    else:
+        keep = np.ones(len(ids), dtype=bool)
+    node_sel, ids, x, y = node_sel[keep], ids[keep], x[keep], y[keep]
+    #### edges of the loaded tiles between two kept nodes
+    u, v = col('edge_u')[edge_sel], col('edge_v')[edge_sel]
+    keep = np.isin(u, ids) & np.isin(v, ids)
+    edge_sel, u, v = edge_sel[keep], u[keep], v[keep]
+    order = np.argsort(ids, kind='stable')
+    u_pos = order[np.searchsorted(ids, u, sorter=order)]
+    v_pos = order[np.searchsorted(ids, v, sorter=order)]
+    edge_order = np.argsort(u_pos, kind='stable')
+    edge_sel = edge_sel[edge_order]
+    u_pos, v_pos = u_pos[edge_order], v_pos[edge_order]
+    offsets = col('edge_geom_offsets')
+    geom_wkb, geom_offsets = _gather_bytes(col('edge_geom_wkb'), offsets[edge_sel], offsets[edge_sel + 1])
+    attrs = {}
+    for prefix, sel in (('node', node_sel), ('edge', edge_sel)):
+        attrs[prefix] = {}
+        for name, categories in meta[f"{prefix}_attrs"].items():
+            values = np.asarray(col(f"{prefix}_{name}")[sel])
+            if categories is not None:
+                lookup = np.empty(len(categories) + 1, dtype=object)  # code -1 -> last entry -> None
+                for i, c in enumerate(categories):
+                    lookup[i] = c if meta['version'] < 2 else json.loads(c)  # version 1 stored str(value)
+                values = lookup[values]
+            attrs[prefix][name] = values
+    arrays = GraphArrays(np.asarray(ids), np.asarray(x), np.asarray(y), u_pos, v_pos,
+                         col('edge_key')[edge_sel], col('edge_length')[edge_sel],
+                         geom_wkb=geom_wkb, geom_offsets=geom_offsets, crs=meta['crs'],
+                         node_attrs=attrs['node'], edge_attrs=attrs['edge'])
+    if as_arrays:
+        return arrays
+    G = arrays.to_networkx()
+    G.graph.update(meta['graph'])
+    return G
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import pickle
+
+import geopandas as gpd
+import numpy as np
+
+import create_shape_file as csf
+import reachability
+from _lazy import lazy_import
+from graph_arrays import GraphArrays
+
+ox = lazy_import('osmnx')
+
+CACHE_DIR = 'Gis_layers/graph_cache'
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+TILE_SIZE = 0.05  # degrees
+VERSION = 2  # entries keep the lon/lat node attributes since version 2
+
+### wgs84 bbox of a point buffer snapped outward to the tile grid -> nearby homes share one cache entry ###
+def tile_bounds(point,dist,tile_size=TILE_SIZE):
+    lon, lat = point
+    dlat = dist / 111_320
+    dlon = dist / (111_320 * np.cos(np.radians(lat)))
+    minx = np.floor((lon - dlon) / tile_size) * tile_size
+    miny = np.floor((lat - dlat) / tile_size) * tile_size
+    maxx = np.ceil((lon + dlon) / tile_size) * tile_size
+    maxy = np.ceil((lat + dlat) / tile_size) * tile_size
+    return tuple(round(float(c), 6) for c in (minx, miny, maxx, maxy))
+
+### signature of the source layer, changes whenever the files on disc change ###
+def source_signature(path):
+    files = [f"{path}/nodes.shp", f"{path}/edges.shp"] if os.path.isdir(path) else [path]
+    sig = []
+    for f in files:
+        st = os.stat(f)
+        sig.append([os.path.abspath(f), st.st_size, st.st_mtime_ns])
+    return sig
+
+### content address of a prepared graph ###
+def cache_key(path,bounds,to_crs,travel_speed):
+    payload = json.dumps({'version': VERSION, 'source': source_signature(path), 'bounds': bounds,
+                          'crs': 'utm' if to_crs is None else str(to_crs), 'speed': float(travel_speed)}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+### load the raw (unprojected) graph inside bounds from a shapefile layer dir or a gpickle ###
+def load_source_graph(path,bounds):
+    if os.path.isdir(path):
+        return csf.load_graph_in_bounds(path,bounds)
+    with open(path, 'rb') as f:  # networkx 3 has no read_gpickle
+        G = pickle.load(f)
+    minx, miny, maxx, maxy = bounds
+    inside = [n for n, d in G.nodes(data=True) if minx <= d['x'] <= maxx and miny <= d['y'] <= maxy]
+    sub = G.subgraph(inside).copy()
+    return sub if csf.is_valid(sub) else None
+
+### drop least recently used entries until the cache fits into max_bytes ###
+def evict(cache_dir=CACHE_DIR,max_bytes=MAX_CACHE_BYTES):
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npz'):
+            st = os.stat(os.path.join(cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_dir, name))
+        total -= size
+
+### projected, time weighted graph for the tile around point -> built once, then read from cache ###
+def load_prepared_graph(path,point,dist,travel_speed,to_crs=None,cache_dir=CACHE_DIR,tile_size=TILE_SIZE,max_bytes=MAX_CACHE_BYTES,as_arrays=False):
+    bounds = tile_bounds(point,dist,tile_size)
+    entry = os.path.join(cache_dir, f"{cache_key(path,bounds,to_crs,travel_speed)}.npz")
+    if os.path.exists(entry):
+        os.utime(entry)  # mark as recently used
+        arrays = GraphArrays.load(entry)
+    else:
+        G = load_source_graph(path,bounds)
+        if G is None:
+            return None
+        G = reachability.prepare_graph(G,travel_speed,to_crs=to_crs)
+        arrays = GraphArrays.from_networkx(G, node_attrs=('lon', 'lat'))
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{entry}.{os.getpid()}.tmp"
+        arrays.save(tmp)
+        os.replace(tmp, entry)
+        evict(cache_dir,max_bytes)
+    return arrays if as_arrays else arrays.to_networkx()
+
+### nearest node of a (lon,lat) point by great circle distance, as ox.distance.nearest_nodes snaps on the unprojected graph ###
+def nearest_node(arrays,point):
+    dist = ox.distance.great_circle(point[1], point[0], arrays.node_attrs['lat'].astype(float), arrays.node_attrs['lon'].astype(float))
+    return int(np.argmin(dist))
+
+### reachability.reachability_polygon on the cached arrays -> no networkx graph is built on a cache hit ###
+def reachability_polygon(path,point,dist,trip_times,travel_speed,to_crs=None,edge_buff=25,node_buff=50,infill=False,cache_dir=CACHE_DIR):
+    arrays = load_prepared_graph(path,point,dist,travel_speed,to_crs=to_crs,cache_dir=cache_dir,as_arrays=True)
+    if arrays is None:
+        return None
+    polys = reachability.make_iso_polys_arrays(arrays,nearest_node(arrays,point),trip_times,edge_buff=edge_buff,node_buff=node_buff,infill=infill)
+    return gpd.GeoDataFrame(geometry=gpd.GeoSeries(polys), crs=arrays.crs)
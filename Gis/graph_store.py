@@ -0,0 +1,91 @@
+import json
+import os
+import pickle
+from functools import lru_cache
+
+import numpy as np
+import shapely
+
+import geo_utils as gu
+from _lazy import lazy_import
+
+nx = lazy_import('networkx')
+
+TILE_SIZE = 0.02  # degrees
+
+### tile index of wgs84 coordinates ###
+def tile_of(x,y,tile_size=TILE_SIZE):
+    return np.floor(np.asarray(x) / tile_size).astype(np.int64), np.floor(np.asarray(y) / tile_size).astype(np.int64)
+
+### split a (region) graph into tiles on disc -> every tile keeps its nodes and the out edges of those nodes with all attributes ###
+def build_graph_store(G,store_path,tile_size=TILE_SIZE):
+    os.makedirs(store_path, exist_ok=True)
+    ids = list(G.nodes)
+    x = np.fromiter((d['x'] for _, d in G.nodes(data=True)), dtype=float, count=len(ids))
+    y = np.fromiter((d['y'] for _, d in G.nodes(data=True)), dtype=float, count=len(ids))
+    tx, ty = tile_of(x,y,tile_size)
+    tiles = {}
+    node_tile = {}
+    for i, n in enumerate(ids):
+        t = (int(tx[i]), int(ty[i]))
+        node_tile[n] = t
+        tiles.setdefault(t, {'ids': [], 'x': [], 'y': [], 'nodes': [], 'edges': []})
+        tile = tiles[t]
+        tile['ids'].append(n)
+        tile['x'].append(x[i])
+        tile['y'].append(y[i])
+        tile['nodes'].append((n, G.nodes[n]))
+    for u, v, k, d in G.edges(keys=True, data=True):
+        tiles[node_tile[u]]['edges'].append((u, v, k, d))
+    for (i, j), tile in tiles.items():
+        tile['x'] = np.array(tile['x'])
+        tile['y'] = np.array(tile['y'])
+        with open(f"{store_path}/tile_{i}_{j}.pkl", 'wb') as f:
+            pickle.dump(tile, f, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(f"{store_path}/index.json", 'w') as f:
+        # graph metadata keeps bools and numbers (simplified=False), other objects (e.g. a crs) become strings
+        json.dump({'tile_size': tile_size, 'graph': G.graph,
+                   'tiles': sorted([list(t) for t in tiles])}, f, default=str)
+    #### a rebuilt store must not be served from the tiles cached in this process
+    read_index.cache_clear()
+    read_tile.cache_clear()
+
+### convert the region gpickle once, e.g. Gis_layers/roads_walk_Berlin_Havelland.pkl ###
+def build_graph_store_from_pickle(pickle_path,store_path,tile_size=TILE_SIZE):
+    with open(pickle_path, 'rb') as f:  # networkx 3 has no read_gpickle
+        G = pickle.load(f)
+    build_graph_store(G,store_path,tile_size)
+
+@lru_cache(maxsize=1)
+def read_index(store_path):
+    with open(f"{store_path}/index.json") as f:
+        index = json.load(f)
+    index['tiles'] = {tuple(t) for t in index['tiles']}
+    return index
+
+@lru_cache(maxsize=64)
+def read_tile(store_path,i,j):
+    with open(f"{store_path}/tile_{i}_{j}.pkl", 'rb') as f:
+        return pickle.load(f)
+
+### subgraph of all nodes intersecting a wgs84 polygon, only tiles touching its bbox are read ###
+def load_subgraph_in_polygon(store_path,polygon):
+    index = read_index(store_path)
+    minx, miny, maxx, maxy = polygon.bounds
+    (tx0, tx1), (ty0, ty1) = tile_of([minx, maxx], [miny, maxy], index['tile_size'])
+    shapely.prepare(polygon)
+    tiles = [read_tile(store_path, i, j) for i in range(tx0, tx1 + 1) for j in range(ty0, ty1 + 1) if (i, j) in index['tiles']]
+    G = nx.MultiDiGraph(**index['graph'])
+    selected = set()
+    for tile in tiles:
+        inside = shapely.intersects_xy(polygon, tile['x'], tile['y'])
+        G.add_nodes_from(node for node, keep in zip(tile['nodes'], inside) if keep)
+        selected.update(n for n, keep in zip(tile['ids'], inside) if keep)
+    for tile in tiles:
+        G.add_edges_from(e for e in tile['edges'] if e[0] in selected and e[1] in selected)
+    return G
+
+### subgraph within dist meters of a (lon,lat) point ###
+def load_subgraph(store_path,point,dist):
+    buff = gu.create_point_buffer(point,dist).to_crs("epsg:4326")
+    return load_subgraph_in_polygon(store_path,buff['geometry'][0])
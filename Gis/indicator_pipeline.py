@@ -0,0 +1,224 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import shapely
+
+import create_shape_file as csf
+import gps_stream
+import instrumentation
+import layer_store
+import network_metrics
+import projection
+import spatial_overlays as so
+
+STORE_DIR = 'features/indicators'
+CACHE_DIR = 'features/stage_cache'
+WORKERS = 4
+
+log = logging.getLogger(__name__)
+
+##### default inputs, layer names as written by get_osm_for_themes #####
+CONFIG = {'lat_lon_col_names': ['latitude', 'longitude'],
+          'cluster_dist': 40,
+          'home_dist': 500,
+          'network_dist': 1000,
+          'visit_layers': {'NumHealth': 'Gis_layers/Health_layer_berlinHavelland',
+                           'NumShop': 'Gis_layers/Shop_layer_berlinHavelland'},
+          'home_layers': {'NumRes_shop': 'Gis_layers/Shop_layer_berlinHavelland',
+                          'NumRes_health': 'Gis_layers/Health_layer_berlinHavelland',
+                          'NumRes_stations': 'Gis_layers/PublicTransport_layer_berlinHavelland'},
+          'green_layer': 'Gis_layers/Green_layer_berlinHavelland',
+          'graph': 'Gis_layers/roads_walk_Berlin_Havelland.pkl'}
+
+### indicator columns in the order and naming of model.py ###
+COLUMNS = ['CHull', 'NumRevPl', 'NumUniqPl', 'AvgRevisitedLS', 'GreenR', 'NumRes_shop', 'NumRes_health',
+           'NumRes_stations', 'InterDens', 'NumHealth', 'NumShop', 'GravCompact']
+
+_shared = {}
+
+#################### stages #########################################
+### every stage gets one participant (user, tracks, clusters, home_lon, home_lat) and returns a dict of indicators
+
+### lifespace indicators from the raw tracking export ###
+def stage_lifespace(participant,config):
+    ls = gps_stream.lifespace_from_file(participant['tracks'],config['lat_lon_col_names'])
+    return {'CHull': ls['CHull_skm'], 'GravCompact': ls['GravCompact'], 'AvgRevisitedLS': ls['RevisitedLS'].mean()}
+
+### unique and revisited places from the dwell clusters (one row per visit) ###
+def stage_places(participant,config):
+    visits = pd.read_csv(participant['clusters']).groupby('place_id').size()
+    return {'NumUniqPl': int(len(visits)), 'NumRevPl': int((visits > 1).sum())}
+
+### visits to dwell clusters within cluster_dist of a feature of the layer ###
+def stage_visits(participant,config):
+    df = pd.read_csv(participant['clusters'])
+    counts, _ = so.cluster_layer_counts(config['visit_layers'],df,dist=config['cluster_dist'])
+    visits = df.groupby('place_id').size()
+    return {name: int(visits.reindex(counts.index[counts[name].values > 0]).sum()) for name in counts.columns}
+
+### resources and green share within home_dist of the home location ###
+def stage_home(participant,config):
+    home = (participant['home_lon'], participant['home_lat'])
+    buffers, proj = projection.point_buffers([home[0]],[home[1]],config['home_dist'])
+    buff = buffers[0]
+    bbox = shapely.bounds(projection.transform_geoms(buffers,proj,projection.WGS84))[0]
+    indicators = {}
+    for name, path in config['home_layers'].items():
+        points = so.layer_points(path,tuple(bbox),proj)
+        indicators[name] = int(shapely.intersects_xy(buff, points[:, 0], points[:, 1]).sum())
+    green = np.empty(0, dtype=object)
+    if os.path.exists(f"{config['green_layer']}_polygon.shp"):
+        layer = csf.read_layer(f"{config['green_layer']}_polygon.shp",bbox=tuple(bbox))
+        green = projection.transform_geoms(layer.geometry.values,layer.crs,proj)
+    indicators['GreenR'] = shapely.intersection(shapely.union_all(green), buff).area / buff.area
+    return indicators
+
+### intersection density of the walk network around home ###
+def stage_network(participant,config):
+    arrays = shared_arrays(config['graph'])
+    stats = network_metrics.network_metrics_batch(arrays,[(participant['home_lon'], participant['home_lat'])],dist=config['network_dist'])
+    return {'InterDens': float(stats['intersection_density_km'].iloc[0])}
+
+### stage -> (function, config keys it depends on, participant fields it depends on) ###
+STAGES = {'lifespace': (stage_lifespace, ('lat_lon_col_names',), ('tracks',)),
+          'places': (stage_places, (), ('clusters',)),
+          'visits': (stage_visits, ('visit_layers', 'cluster_dist'), ('clusters',)),
+          'home': (stage_home, ('home_layers', 'green_layer', 'home_dist'), ('home_lon', 'home_lat')),
+          'network': (stage_network, ('graph', 'network_dist'), ('home_lon', 'home_lat'))}
+
+#################### caching ########################################
+
+### files are identified by path, size and mtime, other values by themselves ###
+def signature(value):
+    if isinstance(value, str) and os.path.isfile(value):
+        st = os.stat(value)
+        return [os.path.abspath(value), st.st_size, st.st_mtime_ns]
+    if isinstance(value, dict):
+        return {k: signature(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [signature(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+### layer prefixes stand for the point and polygon shapefiles (with their sidecar files) behind them ###
+### a layer store is only read while it matches these files (layer_store.has_store) -> the store needs no key of its own
+def layer_signature(prefix):
+    files = [f for suffix in ('_points.shp', '_polygon.shp', '.shp') if os.path.exists(f"{prefix}{suffix}")
+             for f in layer_store.source_files(f"{prefix}{suffix}")]
+    return signature(files) if files else signature(prefix)
+
+### content address of a stage result -> changes only if the inputs of that stage change ###
+def stage_key(stage,participant,config):
+    _, config_keys, fields = STAGES[stage]
+    inputs = {}
+    for key in config_keys:
+        value = config[key]
+        if key.endswith('_layers'):
+            inputs[key] = {name: layer_signature(path) for name, path in value.items()}
+        elif key.endswith('_layer'):
+            inputs[key] = layer_signature(value)
+        else:
+            inputs[key] = signature(value)
+    payload = json.dumps({'stage': stage, 'config': inputs, 'participant': {f: signature(participant[f]) for f in fields}},
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+### stage result from the cache or computed and written atomically ###
+def run_stage(stage,participant,config,cache_dir=CACHE_DIR):
+    out = f"{cache_dir}/{stage}"
+    os.makedirs(out, exist_ok=True)
+    path = f"{out}/{participant['user']}_{stage_key(stage,participant,config)}.pkl"
+    if os.path.exists(path):
+        with instrumentation.stage(f'file_io.cached_{stage}'), open(path, 'rb') as f:
+            return pickle.load(f)
+    with instrumentation.stage(f'pipeline.{stage}'):
+        result = STAGES[stage][0](participant,config)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+    return result
+
+#################### feature store ##################################
+
+### one parquet file per participant -> rows are added while the run is going ###
+### every part has all indicator columns (float, NaN if not computed yet), indicators of stages that are not
+### part of this run are kept from the existing part
+def write_row(row,store_dir=STORE_DIR):
+    os.makedirs(store_dir, exist_ok=True)
+    path = f"{store_dir}/part-{row['user']}.parquet"
+    previous = pd.read_parquet(path).iloc[0].to_dict() if os.path.exists(path) else {}
+    values = {c: row.get(c, previous.get(c, np.nan)) for c in COLUMNS}
+    df = pd.DataFrame([{'user': row['user'], **values}]).astype({c: float for c in COLUMNS})
+    tmp = f"{store_dir}/.part-{row['user']}.{os.getpid()}.tmp"  # hidden files are skipped when the store is read
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+### whole store, or only the given part files ###
+def read_feature_store(store_dir=STORE_DIR,columns=None,paths=None):
+    import pyarrow.dataset as ds
+    source = store_dir if paths is None else list(paths)
+    table = ds.dataset(source, format='parquet').to_table(columns=None if columns is None else ['user'] + list(columns))
+    return table.to_pandas().set_index('user').sort_index()
+
+#################### pipeline #######################################
+
+### region graph as arrays, loaded once per process ###
+def shared_arrays(path):
+    if _shared.get('graph_path') != path:
+        _shared.update(graph_path=path, arrays=network_metrics.load_region_arrays(path))
+    return _shared['arrays']
+
+def _init_worker(graph_path,arrays,profile):
+    _shared.update(graph_path=graph_path, arrays=arrays)
+    if profile is not None:
+        instrumentation.enable(memory=profile == 'mem')
+
+### full indicator row of one participant, every stage from cache if its inputs did not change ###
+def participant_row(participant,config=CONFIG,cache_dir=CACHE_DIR,stages=None):
+    row = {'user': participant['user']}
+    with instrumentation.participant(participant['user']), instrumentation.stage('pipeline.participant'):
+        for stage in (STAGES if stages is None else stages):
+            row.update(run_stage(stage,participant,config,cache_dir))
+    return {'user': row['user'], **{c: row[c] for c in COLUMNS if c in row}}
+
+### stage records of the participant travel back with the result ###
+def _participant_task(task):
+    participant, config, cache_dir, store_dir, stages = task
+    path = write_row(participant_row(participant,config,cache_dir,stages),store_dir)
+    return path, instrumentation.drain()
+
+### indicators of all participants (df or list of dicts with user, tracks, clusters, home_lon, home_lat) ###
+### the region graph is loaded once and shared with the workers, finished rows go straight to the feature store ###
+### returns the rows of these participants, read_feature_store gives the whole store ###
+def run_pipeline(participants,config=CONFIG,store_dir=STORE_DIR,cache_dir=CACHE_DIR,workers=WORKERS,stages=None):
+    if isinstance(participants, pd.DataFrame):
+        participants = participants.to_dict('records')
+    tasks = [(p, config, cache_dir, store_dir, stages) for p in participants]
+    if stages is None or 'network' in stages:
+        shared_arrays(config['graph'])
+    paths = []
+    if workers == 1:
+        for task in tasks:
+            path, records = _participant_task(task)
+            instrumentation.extend(records)
+            paths.append(path)
+            log.info(f"saved {path}")
+    else:
+        profile = instrumentation.mode()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(_shared.get('graph_path'), _shared.get('arrays'), profile)) as pool:
+            for future in as_completed([pool.submit(_participant_task, task) for task in tasks]):
+                path, records = future.result()
+                instrumentation.extend(records)
+                paths.append(path)
+                log.info(f"saved {path}")
+    return read_feature_store(store_dir,paths=paths)
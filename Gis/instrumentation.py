@@ -0,0 +1,164 @@
+import logging
+import os
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+##### stage timing for the Gis hot paths #####
+### off by default -> stage() hands back one shared no-op object, switch on with enable() or GIS_PROFILE=1
+### with memory=True (GIS_PROFILE=mem) the peak of traced allocations per stage is recorded as well
+
+_state = {'enabled': os.environ.get('GIS_PROFILE', '') not in ('', '0'),
+          'memory': os.environ.get('GIS_PROFILE', '') == 'mem',
+          'run': uuid.uuid4().hex[:8],
+          'participant': None}
+_records = []
+_stack = []
+if _state['memory']:
+    tracemalloc.start()
+
+
+### falsy, so expensive counts can be skipped with "if s: s.count(...)" ###
+class _NullStage:
+    def __bool__(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, **counts):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    def __init__(self, name, counts):
+        self.name = name
+        self.counts = dict(counts)
+        self.peak = 0
+
+    def __enter__(self):
+        #### memory is only recorded for stages that started with tracing on (enable() may switch it mid-stage)
+        self.memory = _state['memory'] and tracemalloc.is_tracing()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if _stack:
+                _stack[-1].peak = max(_stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.base = current
+        _stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.start
+        _stack.pop()
+        record = {'run': _state['run'], 'participant': _state['participant'], 'stage': self.name,
+                  'parent': _stack[-1].name if _stack else None, 'wall': wall, 'failed': exc[0] is not None}
+        if self.memory and tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            if _stack:
+                _stack[-1].peak = max(_stack[-1].peak, self.peak)
+            tracemalloc.reset_peak()
+            record['peak_mb'] = (self.peak - self.base) / 1024 ** 2
+        record.update(self.counts)
+        _records.append(record)
+        log.debug(f"{self.name} {wall:.3f}s {self.counts}")
+        return False
+
+    ### item counts known only inside the stage (nodes, edges, features, days) ###
+    def count(self, **counts):
+        self.counts.update(counts)
+
+
+### with stage('graph_load', path=path) as s: ... s.count(nodes=len(G)) ###
+def stage(name, **counts):
+    if not _state['enabled']:
+        return _NULL
+    return _Stage(name, counts)
+
+def enabled():
+    return _state['enabled']
+
+### None (off), 'time' or 'mem' -> handed to worker processes ###
+def mode():
+    if not _state['enabled']:
+        return None
+    return 'mem' if _state['memory'] else 'time'
+
+def enable(memory=False):
+    _state.update(enabled=True, memory=memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    _state['enabled'] = False
+    if _state['memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _state['memory'] = False
+
+### records of all stages inside belong to this participant ###
+@contextmanager
+def participant(user):
+    previous = _state['participant']
+    _state['participant'] = user
+    try:
+        yield
+    finally:
+        _state['participant'] = previous
+
+### records collected so far, cleared -> workers send them back to the parent ###
+def drain():
+    records = list(_records)
+    _records.clear()
+    return records
+
+def extend(records):
+    _records.extend(records)
+
+def records():
+    return pd.DataFrame(_records)
+
+### per participant and stage: calls, wall time, peak memory and summed item counts ###
+def participant_stats(df=None):
+    return _aggregate(records() if df is None else df, ['participant', 'stage'])
+
+### per run and stage over all participants ###
+def run_stats(df=None):
+    return _aggregate(records() if df is None else df, ['run', 'stage'])
+
+def _aggregate(df,by):
+    if len(df) == 0:
+        return pd.DataFrame()
+    df = df.copy()
+    df['participant'] = df['participant'].astype(object).where(df['participant'].notna(), '')
+    counts = [c for c in df.columns if c not in ('run', 'participant', 'stage', 'parent', 'wall', 'failed', 'peak_mb')]
+    agg = {'wall': ['count', 'sum', 'mean', 'max'], 'failed': 'sum'}
+    if 'peak_mb' in df.columns:
+        agg['peak_mb'] = 'max'
+    agg.update({c: 'sum' for c in counts})
+    stats = df.groupby(by).agg(agg)
+    stats.columns = ['calls', 'wall_total', 'wall_mean', 'wall_max', 'failed'] + (['peak_mb'] if 'peak_mb' in df.columns else []) + counts
+    return stats.sort_values('wall_total', ascending=False)
+
+### raw records plus both aggregations, csv files next to each other ###
+def export(prefix):
+    df = records()
+    df.to_csv(f"{prefix}_stages.csv", index=False)
+    participant_stats(df).to_csv(f"{prefix}_participants.csv")
+    run_stats(df).to_csv(f"{prefix}_run.csv")
+    return prefix
+
+### progress messages of the Gis modules go through logging, this shows them on the console ###
+def log_to_console(level=logging.INFO):
+    logging.basicConfig(level=level, format='%(asctime)s %(name)s %(message)s')
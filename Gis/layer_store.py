@@ -0,0 +1,102 @@
+import json
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import pyproj
+import shapely
+
+ROW_GROUP_SIZE = 4096
+TILE_SIZE = 0.01  # degrees
+
+### Gis_layers/Green_layer_points.shp -> Gis_layers/Green_layer_points.store ###
+def store_path(path):
+    return os.path.splitext(str(path))[0] + '.store'
+
+### the shapefile and its sidecars, attribute edits only touch the .dbf ###
+def source_files(path):
+    base = os.path.splitext(str(path))[0]
+    return [f"{base}{ext}" for ext in ('.shp', '.shx', '.dbf', '.prj', '.cpg') if os.path.exists(f"{base}{ext}")]
+
+### size and mtime of the source files -> a store built from an older shapefile no longer matches ###
+def source_signature(path):
+    return {os.path.splitext(f)[1]: [os.stat(f).st_size, os.stat(f).st_mtime_ns] for f in source_files(path)}
+
+### a store that matches the shapefile next to it (or the store alone if the shapefile is gone) ###
+def has_store(path):
+    if not os.path.exists(f"{store_path(path)}/meta.json"):
+        return False
+    if not os.path.exists(str(path)):
+        return True
+    return read_meta(path).get('source_files') == source_signature(path)
+
+### convert a shapefile layer once: features sorted by tile into parquet row groups (attributes + wkb) plus a memory mappable bounds array ###
+def build_layer_store(path,tile_size=TILE_SIZE,row_group_size=ROW_GROUP_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    out = store_path(path)
+    os.makedirs(out, exist_ok=True)
+    gdf = gpd.read_file(path)
+    geoms = np.asarray(gdf.geometry.values)
+    bounds = shapely.bounds(geoms)
+    #### neighbouring features end up in the same row groups
+    tx = np.floor((bounds[:, 0] + bounds[:, 2]) / 2 / tile_size)
+    ty = np.floor((bounds[:, 1] + bounds[:, 3]) / 2 / tile_size)
+    order = np.lexsort((tx, ty))
+    df = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)).iloc[order].reset_index(drop=True)
+    df['_fid'] = order  # row number in the shapefile, keeps the read order of gpd.read_file
+    df['geometry'] = shapely.to_wkb(geoms[order])
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), f"{out}/features.parquet", row_group_size=row_group_size)
+    np.save(f"{out}/bounds.npy", bounds[order])
+    with open(f"{out}/meta.json", 'w') as f:
+        json.dump({'crs': None if gdf.crs is None else gdf.crs.to_wkt(), 'source': os.path.abspath(path), 'n': len(gdf),
+                   'source_files': source_signature(path)}, f)
+
+def read_meta(path):
+    with open(f"{store_path(path)}/meta.json") as f:
+        return json.load(f)
+
+### parsing the wkt costs more than reading a few row groups -> once per crs ###
+@lru_cache(maxsize=32)
+def parse_crs(wkt):
+    return None if wkt is None else pyproj.CRS.from_user_input(wkt)
+
+### bbox as (minx,miny,maxx,maxy) in the crs of the layer, like gpd.read_file resolves it ###
+def bbox_bounds(bbox,crs):
+    if isinstance(bbox, (gpd.GeoDataFrame, gpd.GeoSeries)):
+        if crs is not None and bbox.crs is not None and bbox.crs != crs:
+            bbox = bbox.to_crs(crs)
+        return tuple(bbox.total_bounds)
+    if isinstance(bbox, shapely.Geometry):
+        return bbox.bounds
+    return tuple(bbox)
+
+### read a stored layer, with bbox only the row groups holding candidate features are read ###
+def read_layer(path,bbox=None):
+    import pyarrow.parquet as pq
+    meta = read_meta(path)
+    pf = pq.ParquetFile(f"{store_path(path)}/features.parquet", memory_map=True)
+    if bbox is None:
+        df = pf.read().to_pandas()
+    else:
+        minx, miny, maxx, maxy = bbox_bounds(bbox,meta['crs'])
+        b = np.load(f"{store_path(path)}/bounds.npy", mmap_mode='r')
+        hit = np.flatnonzero((b[:, 0] <= maxx) & (b[:, 2] >= minx) & (b[:, 1] <= maxy) & (b[:, 3] >= miny))
+        starts = np.cumsum([0] + [pf.metadata.row_group(i).num_rows for i in range(pf.num_row_groups)])
+        group_of = np.searchsorted(starts, hit, side='right') - 1
+        groups = np.unique(group_of)
+        #### position of each hit inside the concatenated row groups
+        sizes = np.diff(starts)[groups]
+        group_offset = dict(zip(groups.tolist(), np.concatenate([[0], np.cumsum(sizes)[:-1]]).tolist()))
+        local = hit - starts[group_of] + np.array([group_offset[g] for g in group_of.tolist()], dtype=np.int64)
+        df = pf.read_row_groups(groups.tolist()).take(local).to_pandas() if len(hit) else pf.schema_arrow.empty_table().to_pandas()
+    geometry = shapely.from_wkb(df.pop('geometry').values)
+    if bbox is not None:
+        #### exact test against the box as ogr does for the shapefile bbox filter
+        inside = shapely.intersects(geometry, shapely.box(minx, miny, maxx, maxy))
+        df, geometry = df[inside], geometry[inside]
+    order = np.argsort(df['_fid'].values, kind='stable')
+    df = df.iloc[order].drop(columns='_fid').reset_index(drop=True)
+    return gpd.GeoDataFrame(df, geometry=geometry[order], crs=parse_crs(meta['crs']))
@@ -0,0 +1,75 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import shapely
+
+import projection
+from day_overlap import DayOverlapIndex
+
+
+### lifespace indicators of one user from the daily convex hulls -> projected once, shared intermediates computed once ###
+class LifespaceIndicators:
+    def __init__(self, convex_hulls_gdf, dates, proj=None):
+        self.dates = dates
+        self.gdf_p = projection.project_gdf(convex_hulls_gdf, to_crs=proj)
+        self.geoms = np.asarray(self.gdf_p.geometry.values)
+
+    @cached_property
+    def union(self):
+        return shapely.union_all(self.geoms)
+
+    @cached_property
+    def hull(self):
+        return self.union.convex_hull
+
+    ### day areas, pairwise overlaps and covered parts shared by RevisitedLS and day_convex_overlapping
+    @cached_property
+    def overlaps(self):
+        return DayOverlapIndex.from_geoms(self.dates,self.geoms,self.gdf_p.crs)
+
+    @cached_property
+    def areas(self):
+        return shapely.area(self.geoms)
+
+    @cached_property
+    def perimeters(self):
+        return shapely.length(self.geoms)
+
+    ### see geo_utils.RevisitedLS
+    def revisited_ls(self):
+        return self.overlaps.revisited_ls()
+
+    ### see geo_utils.CHull_skm
+    def chull_skm(self):
+        return self.hull.area / 1e6
+
+    ### see geo_utils.CHull_skm_daily
+    def chull_skm_daily(self):
+        return pd.Series(self.areas / 1e6, index=self.gdf_p.index)
+
+    ### see geo_utils.GravCompact
+    def grav_compact(self):
+        return self.hull.length / (2 * np.sqrt(np.pi * self.hull.area))
+
+    ### see geo_utils.GravCompact_daily
+    def grav_compact_daily(self):
+        return pd.Series(self.perimeters / (2 * np.sqrt(np.pi * self.areas)), index=self.gdf_p.index)
+
+    ### see geo_utils.day_convex_overlapping
+    def day_convex_overlapping(self):
+        return self.overlaps.day_convex_overlapping()
+
+    ### all indicators in one call, keys named like the geo_utils functions
+    def all(self):
+        return {'RevisitedLS': self.revisited_ls(),
+                'CHull_skm': self.chull_skm(),
+                'CHull_skm_daily': self.chull_skm_daily(),
+                'GravCompact': self.grav_compact(),
+                'GravCompact_daily': self.grav_compact_daily(),
+                'day_convex_overlapping': self.day_convex_overlapping()}
+
+
+### one projection and union for every lifespace indicator of a user
+def lifespace_indicators(convex_hulls_gdf, dates, proj=None):
+    return LifespaceIndicators(convex_hulls_gdf, dates, proj=proj).all()
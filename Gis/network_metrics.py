@@ -0,0 +1,115 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import shapely
+
+import geo_utils as gu
+import graph_arrays
+from instrumentation import stage
+
+
+### region graph as arrays, from the columnar graph format or a gpickle ###
+def load_region_arrays(path):
+    with stage('graph_load.region_arrays') as s:
+        if graph_arrays.is_columnar(path):
+            arrays = graph_arrays.read_columnar_graph(path,as_arrays=True)
+        else:
+            # networkx 3 has no read_gpickle, the files are plain pickles
+            with open(path, 'rb') as f:
+                G = pickle.load(f)
+            arrays = graph_arrays.GraphArrays.from_networkx(G,node_attrs=('street_count',),edge_attrs=('osmid',))
+        s.count(nodes=len(arrays), edges=len(arrays.u))
+    return arrays
+
+### edges between selected nodes, found through the csr rows of the selected nodes ###
+def induced_edges(arrays,node_mask):
+    nodes = np.flatnonzero(node_mask)
+    starts, ends = arrays.indptr[nodes], arrays.indptr[nodes + 1]
+    lengths = ends - starts
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    edges = np.repeat(starts - offsets, lengths) + np.arange(lengths.sum())
+    return edges[node_mask[arrays.v[edges]]]
+
+### physical streets per node like osmnx count_streets_per_node: undirected edges incl. parallel ones, self-loops count twice ###
+def count_streets(arrays,edges,n_nodes):
+    u, v, key = arrays.u[edges], arrays.v[edges], arrays.key[edges]
+    a, b = np.minimum(u, v), np.maximum(u, v)
+    undirected = np.unique(np.column_stack([a, b, key]), axis=0)
+    loops = undirected[:, 0] == undirected[:, 1]
+    counts = np.bincount(undirected[~loops, 0], minlength=n_nodes) + np.bincount(undirected[~loops, 1], minlength=n_nodes)
+    counts += 2 * np.isin(np.arange(n_nodes), undirected[loops, 0])
+    return counts, undirected
+
+### nodes osmnx simplify_graph keeps as endpoints, from degrees instead of a simplified copy ###
+def endpoints(arrays,edges,node_mask,strict=True):
+    n_nodes = len(arrays)
+    u, v = arrays.u[edges], arrays.v[edges]
+    in_deg = np.bincount(v, minlength=n_nodes)
+    out_deg = np.bincount(u, minlength=n_nodes)
+    self_loop = np.zeros(n_nodes, dtype=bool)
+    self_loop[u[u == v]] = True
+    pairs = np.unique(np.column_stack([np.concatenate([u, v]), np.concatenate([v, u])]), axis=0)
+    neighbors = np.bincount(pairs[:, 0], minlength=n_nodes)
+    degree = in_deg + out_deg
+    end = self_loop | (in_deg == 0) | (out_deg == 0) | ~((neighbors == 2) & ((degree == 2) | (degree == 4)))
+    #### non strict mode: a node where different osm ways meet stays as well
+    osmid = arrays.edge_attrs.get('osmid')
+    if not strict and osmid is not None:
+        osmid = np.asarray(osmid)[edges]
+        _, codes = np.unique(osmid.astype(str), return_inverse=True)
+        node_ids = np.unique(np.column_stack([np.concatenate([u, v]), np.concatenate([codes, codes])]), axis=0)
+        end |= np.bincount(node_ids[:, 0], minlength=n_nodes) > 1
+    return end & node_mask
+
+### street network stats of the subgraph on node_mask, named like ox.basic_stats on the simplified graph ###
+def network_metrics(arrays,node_mask,area=None,street_count=None,strict=True):
+    edges = induced_edges(arrays,node_mask)
+    counts, undirected = count_streets(arrays,edges,len(arrays))
+    if street_count is None:
+        # osmnx reads street_count stored at download time, i.e. counted on the full region graph
+        street_count = arrays.node_attrs.get('street_count', counts)
+    street_count = np.asarray(street_count, dtype=np.int64)
+    end = endpoints(arrays,edges,node_mask,strict)
+    spn = street_count[end]
+    stats = {}
+    stats['n'] = int(end.sum())
+    stats['edge_length_total'] = float(arrays.length[edges].sum())
+    stats['streets_per_node_avg'] = float(spn.mean()) if len(spn) else 0.0
+    stats['streets_per_node_counts'] = dict(enumerate(np.bincount(spn).tolist())) if len(spn) else {}
+    stats['intersection_count'] = int((spn >= 2).sum())
+    stats['intersection_counts_by_degree'] = {k: int((spn >= k).sum()) for k in (1, 2, 3, 4)}
+    #### every simplified street segment starts and ends at an endpoint (isolated cycles without endpoint are not counted)
+    stats['street_segment_count'] = int(counts[end].sum() // 2)
+    edge_len = pd.Series(arrays.length[edges]).groupby([np.minimum(arrays.u[edges], arrays.v[edges]),
+                                                        np.maximum(arrays.u[edges], arrays.v[edges]), arrays.key[edges]]).first()
+    stats['street_length_total'] = float(edge_len.sum())
+    stats['street_length_avg'] = stats['street_length_total'] / stats['street_segment_count'] if stats['street_segment_count'] else 0.0
+    if area is not None:
+        area_km = area / 1_000_000
+        stats['node_density_km'] = stats['n'] / area_km
+        stats['intersection_density_km'] = stats['intersection_count'] / area_km
+        stats['street_density_km'] = stats['street_length_total'] / area_km
+        stats['intersection_3_way_density_km'] = stats['intersection_counts_by_degree'][3] / area_km
+    return stats
+
+### stats for many home buffers on one loaded regional graph, node selection as in load_graph_from_pickle ###
+def network_metrics_batch(arrays,homes,dist=1000,ids=None):
+    ids = list(range(len(homes))) if ids is None else ids
+    x_order = np.argsort(arrays.x, kind='stable')
+    x_sorted = arrays.x[x_order]
+    rows = []
+    for home in homes:
+        buff = gu.create_point_buffer(home,dist)
+        polygon = buff.to_crs("epsg:4326")['geometry'][0]
+        minx, miny, maxx, maxy = polygon.bounds
+        candidates = x_order[np.searchsorted(x_sorted, minx, side='left'):np.searchsorted(x_sorted, maxx, side='right')]
+        candidates = candidates[(arrays.y[candidates] >= miny) & (arrays.y[candidates] <= maxy)]
+        node_mask = np.zeros(len(arrays), dtype=bool)
+        node_mask[candidates[shapely.intersects_xy(polygon, arrays.x[candidates], arrays.y[candidates])]] = True
+        with stage('graph_stats.network_metrics', nodes=int(node_mask.sum())):
+            stats = network_metrics(arrays,node_mask,area=buff['geometry'][0].area)
+        stats.pop('streets_per_node_counts')
+        stats.pop('intersection_counts_by_degree')
+        rows.append(stats)
+    return pd.DataFrame(rows,index=pd.Index(ids,name='id'))
@@ -0,0 +1,246 @@
+import logging
+import os
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.geometry import box
+
+import create_shape_file as csf
+from _lazy import lazy_import
+from instrumentation import stage
+
+nx = lazy_import('networkx')
+ox = lazy_import('osmnx')
+
+TILE_SIZE = 0.05  # degrees
+WORKERS = 4
+TILES_DIR = 'Gis_layers/tiles'
+
+log = logging.getLogger(__name__)
+
+### places as list of names (geocoded) or dict name -> wgs84 polygon (e.g. for a local extract) ###
+def place_polygons(places):
+    if isinstance(places, dict):
+        return dict(places)
+    return {place.split(',')[0]: ox.geocoder.geocode_to_gdf(place).unary_union for place in places}
+
+### split a polygon into square tiles on a fixed grid ###
+def polygon_tiles(polygon,tile_size=TILE_SIZE):
+    if polygon.is_empty:
+        return []
+    minx, miny, maxx, maxy = polygon.bounds
+    tiles = []
+    for x in np.arange(np.floor(minx / tile_size) * tile_size, maxx, tile_size):
+        for y in np.arange(np.floor(miny / tile_size) * tile_size, maxy, tile_size):
+            tile = box(x, y, x + tile_size, y + tile_size)
+            if tile.intersects(polygon):
+                tiles.append(tile.intersection(polygon))
+    return tiles
+
+### osm geometries of one tile from overpass, or of a whole area from a local .osm / .pbf extract ###
+def fetch_geometries(polygon,tags,source=None):
+    if source is None:
+        return ox.geometries.geometries_from_polygon(polygon, tags=tags)
+    if str(source).endswith('.pbf'):
+        return read_pbf(source,polygon,tags)
+    return ox.geometries.geometries_from_xml(source, polygon=polygon, tags=tags)
+
+### .pbf extracts need pyrosm, result is shaped like the osmnx geometries gdf ###
+def read_pbf(source,polygon,tags):
+    from pyrosm import OSM
+    gdf = OSM(str(source), bounding_box=polygon).get_data_by_custom_criteria(custom_filter=tags)
+    if gdf is None:
+        return gpd.GeoDataFrame()
+    gdf = gdf.rename(columns={'osm_type': 'element_type', 'id': 'osmid'})
+    gdf = gdf[gdf.intersects(polygon)]
+    return gdf.set_index(['element_type', 'osmid'])
+
+### features of a parsed area that intersect a tile, columns without values dropped like the polygon query of osmnx does ###
+def clip_to_tile(gdf,tile):
+    if len(gdf) == 0:
+        return gdf
+    return gdf[gdf.intersects(tile)].dropna(axis='columns', how='all')
+
+### street graph of one tile, only from overpass ###
+### every component is kept -> streets that reach the main network through a neighbouring tile survive until the tiles are composed
+def fetch_graph(polygon,network_type='walk'):
+    try:
+        return ox.graph.graph_from_polygon(polygon, network_type=network_type, simplify=False, retain_all=True, truncate_by_edge=True)
+    except ox._errors.InsufficientResponseError:
+        return nx.MultiDiGraph(crs='epsg:4326')
+    except ValueError as e:
+        #### overpass returned ways, but none of their nodes lies inside the tile
+        if 'Found no graph nodes' not in str(e):
+            raise
+        return nx.MultiDiGraph(crs='epsg:4326')
+
+### overpass way filter of an osmnx network type as (key, operator, regex), e.g. ('highway', '!~', 'motor|...') ###
+def network_filter(network_type):
+    return re.findall(r'\["([^"]+)"(?:(!?~)"([^"]*)")?\]', ox._overpass._get_osm_filter(network_type))
+
+### overpass semantics: ["k"] needs the tag, ["k"~"re"] a matching value, ["k"!~"re"] no matching value (or no tag) ###
+def matches_filter(data,conditions):
+    for key, op, pattern in conditions:
+        value = data.get(key)
+        found = value is not None and re.search(pattern, str(value)) is not None
+        if (op == '' and value is None) or (op == '~' and not found) or (op == '!~' and found):
+            return False
+    return True
+
+### street graph of a polygon from a local .osm extract, parsed once, only the ways overpass returns for network_type ###
+def read_xml_graph(source,polygon,network_type='walk'):
+    conditions = network_filter(network_type)
+    useful_tags = ox.settings.useful_tags_way
+    #### the filter tags (foot, motorcar, ...) are kept on the edges until the ways are filtered
+    ox.settings.useful_tags_way = list(dict.fromkeys(list(useful_tags) + [key for key, _, _ in conditions]))
+    try:
+        G = ox.graph.graph_from_xml(source, bidirectional=network_type in ox.settings.bidirectional_network_types, simplify=False, retain_all=True)
+    finally:
+        ox.settings.useful_tags_way = useful_tags
+    G.remove_edges_from([(u, v, k) for u, v, k, d in G.edges(keys=True, data=True) if not matches_filter(d,conditions)])
+    G.remove_nodes_from(list(nx.isolates(G)))
+    extra = {key for key, _, _ in conditions} - set(useful_tags)
+    for _, _, d in G.edges(data=True):
+        for key in extra & d.keys():
+            del d[key]
+    if len(G) == 0:
+        return nx.MultiDiGraph(crs='epsg:4326')
+    return ox.truncate.truncate_graph_polygon(G, polygon, truncate_by_edge=True, retain_all=True)
+
+### street graph of a polygon from a local .osm or .pbf extract ###
+def read_local_graph(source,polygon,network_type='walk'):
+    if str(source).endswith('.pbf'):
+        return read_pbf_graph(source,polygon,network_type)
+    return read_xml_graph(source,polygon,network_type)
+
+### osmnx network types -> pyrosm network types ###
+PBF_NETWORK_TYPES = {'walk': 'walking', 'bike': 'cycling', 'drive': 'driving', 'drive_service': 'driving+service', 'all': 'all'}
+
+### street graph of a polygon from a local .pbf extract (pyrosm), parsed once for the whole polygon ###
+def read_pbf_graph(source,polygon,network_type='walk'):
+    if not str(source).endswith('.pbf'):
+        raise ValueError(f"street graphs from local extracts need a .pbf file, got {source}")
+    if network_type not in PBF_NETWORK_TYPES:
+        raise ValueError(f"network_type {network_type} has no pyrosm equivalent, use one of {list(PBF_NETWORK_TYPES)}")
+    from pyrosm import OSM
+    osm = OSM(str(source), bounding_box=polygon)
+    nodes, edges = osm.get_network(network_type=PBF_NETWORK_TYPES[network_type], nodes=True)
+    if nodes is None or len(nodes) == 0:
+        return nx.MultiDiGraph(crs='epsg:4326')
+    G = osm.to_graph(nodes, edges, graph_type='networkx', osmnx_compatible=True)
+    return ox.truncate.truncate_graph_polygon(G, polygon, truncate_by_edge=True, retain_all=True)
+
+### write a finished tile atomically -> an interrupted run never leaves half written tiles ###
+def write_tile(path,obj):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def read_tile(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def _geometry_task(task):
+    path, polygon, tags, source = task
+    if not os.path.exists(path):
+        write_tile(path, fetch_geometries(polygon,tags,source))
+    return path
+
+def _graph_task(task):
+    path, polygon, network_type = task
+    if not os.path.exists(path):
+        write_tile(path, fetch_graph(polygon,network_type))
+    return path
+
+### download all tile tasks in a thread pool (the requests wait on the network), tiles already on disc are skipped ###
+def run_tiles(fn,tasks,workers=WORKERS):
+    todo = [t for t in tasks if not os.path.exists(t[0])]
+    log.info(f"{len(tasks) - len(todo)} of {len(tasks)} tiles already done")
+    with stage('file_io.run_tiles', tiles=len(todo)), ThreadPoolExecutor(max_workers=workers) as pool:
+        for path in pool.map(fn, todo):
+            log.info(f"saved tile {path}")
+    return [t[0] for t in tasks]
+
+### a local extract is parsed once for all missing tiles, each tile is clipped from the result ###
+def clip_tiles(tasks,tags,source):
+    todo = [t for t in tasks if not os.path.exists(t[0])]
+    log.info(f"{len(tasks) - len(todo)} of {len(tasks)} tiles already done")
+    if todo:
+        area = shapely.union_all([tile for _, tile, _, _ in todo])
+        with stage('file_io.parse_extract', tiles=len(todo)):
+            gdf = fetch_geometries(area,tags,source)
+        for path, tile, _, _ in todo:
+            write_tile(path, clip_to_tile(gdf,tile))
+            log.info(f"saved tile {path}")
+    return [t[0] for t in tasks]
+
+### download / parse all tiles of the places for the given tags, returns the tile files ###
+def acquire_geometry_tiles(places,tags,name,tiles_dir=TILES_DIR,tile_size=TILE_SIZE,source=None,workers=WORKERS):
+    out = f"{tiles_dir}/{name}"
+    os.makedirs(out, exist_ok=True)
+    tasks = []
+    for place, polygon in place_polygons(places).items():
+        for i, tile in enumerate(polygon_tiles(polygon,tile_size)):
+            tasks.append((f"{out}/{place}_{i:05d}.pkl", tile, tags, source))
+    if source is not None:
+        return clip_tiles(tasks,tags,source)
+    return run_tiles(_geometry_task,tasks,workers)
+
+### merge tiles, features crossing tile borders are returned by every tile they touch ###
+def merge_geometry_tiles(paths):
+    gdfs = [gdf for gdf in map(read_tile, paths) if len(gdf) > 0]
+    if len(gdfs) == 0:
+        return None
+    gdf = pd.concat(gdfs)
+    return gdf[~gdf.index.duplicated(keep='first')]
+
+### parallel, resumable version of get_osm_for_place -> same layer files in Gis_layers ###
+def acquire_layer(places,tags,extra=None,layer_name='Max_Gis_layers',tiles_dir=TILES_DIR,tile_size=TILE_SIZE,source=None,workers=WORKERS):
+    paths = acquire_geometry_tiles(places,tags,layer_name,tiles_dir,tile_size,source,workers)
+    gdf = merge_geometry_tiles(paths)
+    if gdf is None:
+        log.info(f"no data for {layer_name}")
+        return None
+    tag_lst = ['geometry']
+    tag_lst.extend(list(tags.keys()))
+    if extra != None:
+        tag_lst.extend(extra)
+    gdf = csf.clean_osm_gdf(gdf)
+    csf.save(layer_name,gdf,tag_lst)
+    return gdf
+
+### parallel, resumable version of save_streetG -> same roads_{network_type}_{place}.pkl files ###
+def acquire_street_graph(places,network_type='walk',tiles_dir=TILES_DIR,tile_size=TILE_SIZE,source=None,workers=WORKERS):
+    for place, polygon in place_polygons(places).items():
+        if source is not None:
+            # a local extract is parsed once, tiling would parse the whole file per tile
+            G = read_local_graph(source,polygon,network_type)
+        else:
+            out = f"{tiles_dir}/roads_{network_type}_{place}"
+            os.makedirs(out, exist_ok=True)
+            tasks = [(f"{out}/{i:05d}.pkl", tile, network_type) for i, tile in enumerate(polygon_tiles(polygon,tile_size))]
+            tiles = [read_tile(p) for p in run_tiles(_graph_task,tasks,workers)]
+            #### a place without any tile (e.g. an empty polygon) gives an empty graph
+            G = nx.compose_all(tiles) if tiles else nx.MultiDiGraph()
+        G.graph['crs'] = 'epsg:4326'
+        #### like a single polygon download (retain_all=False), but only after the tiles are stitched together
+        if len(G) > 0:
+            G = ox.truncate.largest_component(G)
+        write_tile(f'roads_{network_type}_{place}.pkl',G)
+
+### all themes (layer name -> tags) from one scan of the tiles -> same layers as acquire_layer per theme ###
+def acquire_themes(places,themes,extra=None,name='themes',tiles_dir=TILES_DIR,tile_size=TILE_SIZE,source=None,workers=WORKERS):
+    paths = acquire_geometry_tiles(places,csf.merge_tags(themes),name,tiles_dir,tile_size,source,workers)
+    gdf = merge_geometry_tiles(paths)
+    if gdf is None:
+        log.info(f"no data for {name}")
+        return None
+    gdf = csf.clean_osm_gdf(gdf)
+    csf.save_themes(gdf,themes,extra)
+    return gdf
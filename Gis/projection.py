@@ -0,0 +1,78 @@
+from functools import lru_cache
+
+import numpy as np
+import geopandas as gpd
+import pyproj
+import shapely
+
+from instrumentation import stage
+
+WGS84 = 'epsg:4326'
+
+### hashable key of a crs given as string, epsg code or pyproj CRS ###
+def crs_key(crs):
+    if isinstance(crs, pyproj.CRS):
+        return crs.srs or crs.to_wkt()
+    return str(crs)
+
+@lru_cache(maxsize=256)
+def _transformer(src, dst):
+    return pyproj.Transformer.from_crs(src, dst, always_xy=True)
+
+### one transformer per (source, target) pair for the whole process ###
+def get_transformer(src,dst):
+    return _transformer(crs_key(src), crs_key(dst))
+
+@lru_cache(maxsize=256)
+def _is_geographic(crs):
+    return pyproj.CRS.from_user_input(crs).is_geographic
+
+### utm crs of a lon/lat position as epsg code, what gdf.estimate_utm_crs finds without the database query ###
+def utm_crs(lon,lat=0.0):
+    utm_zone = int(np.floor((lon + 180) / 6) % 60) + 1
+    return f"EPSG:{(32600 if lat >= 0 else 32700) + utm_zone}"
+
+### utm crs for the center of the bounds of geometries, like ox.project_gdf with to_crs=None ###
+def estimate_utm_crs(geoms,crs=WGS84):
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+    x, y = (minx + maxx) / 2, (miny + maxy) / 2
+    if not _is_geographic(crs_key(crs)):
+        x, y = transform_xy(x,y,crs,WGS84)
+    return utm_crs(float(x), float(y))
+
+### transform raw coordinate arrays ###
+def transform_xy(x,y,src,dst):
+    return get_transformer(src,dst).transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+### transform an array of shapely geometries ###
+def transform_geoms(geoms,src,dst):
+    transformer = get_transformer(src,dst)
+    def _transform(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return shapely.transform(np.asarray(geoms), _transform)
+
+### project gdf like ox.project_gdf, one cached transformer instead of a new one per call ###
+def project_gdf(gdf,to_crs=None):
+    with stage('projection.project_gdf', features=len(gdf)):
+        geoms = np.asarray(gdf.geometry.values)
+        if to_crs is None:
+            to_crs = estimate_utm_crs(geoms,gdf.crs)
+        projected = gpd.GeoSeries(transform_geoms(geoms,gdf.crs,to_crs), index=gdf.index, crs=to_crs, name=gdf.geometry.name)
+        return gdf.set_geometry(projected)
+
+### centroids of many geometries computed in utm, returned in the source crs ###
+def centroids(geoms,crs=WGS84):
+    geoms = np.asarray(geoms)
+    utm = estimate_utm_crs(geoms,crs)
+    return transform_geoms(shapely.centroid(transform_geoms(geoms,crs,utm)),utm,crs)
+
+### buffers of dist meters around many points -> (projected buffers, crs of the buffers) ###
+def point_buffers(x,y,dist,crs=WGS84,proj=None):
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if proj is None:
+        proj = estimate_utm_crs(shapely.points(x, y),crs)
+    with stage('buffer_union.point_buffers', points=len(x)):
+        px, py = transform_xy(x,y,crs,proj)
+        # quad_segs=16 is the default resolution of GeoSeries.buffer
+        return shapely.buffer(shapely.points(px, py), dist, quad_segs=16), proj
@@ -1,35 +1,47 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import geopandas as gpd
-import matplotlib.pyplot as plt
-import networkx as nx
-import osmnx as ox
-from descartes import PolygonPatch
+import numpy as np
+import shapely
 from shapely.geometry import LineString
 from shapely.geometry import Point
 from shapely.geometry import Polygon
 
+from _lazy import lazy_import
+from instrumentation import stage
+
+nx = lazy_import('networkx')
+ox = lazy_import('osmnx')
+sparse = lazy_import('scipy.sparse')
+csgraph = lazy_import('scipy.sparse.csgraph')
+
 ### build reachability polygon ###
 def make_iso_polys(G, center_node,trip_times, edge_buff=25, node_buff=50, infill=False):
     # NOTE: function from https://github.com/gboeing/osmnx-examples/blob/main/notebooks/13-isolines-isochrones.ipynb
-    isochrone_polys = []
-    for trip_time in sorted(trip_times, reverse=True):
-        subgraph = nx.ego_graph(G, center_node, radius=trip_time, distance="time")
-
-        node_points = [Point((data["x"], data["y"])) for node, data in subgraph.nodes(data=True)]
-        nodes_gdf = gpd.GeoDataFrame({"id": list(subgraph.nodes)}, geometry=node_points)
-        nodes_gdf = nodes_gdf.set_index("id")
-
-        edge_lines = []
-        for n_fr, n_to in subgraph.edges():
-            f = nodes_gdf.loc[n_fr].geometry
-            t = nodes_gdf.loc[n_to].geometry
-            edge_lookup = G.get_edge_data(n_fr, n_to)[0].get("geometry", LineString([f, t]))
-            edge_lines.append(edge_lookup)
+    # one dijkstra pass for the largest trip time, the smaller rings are cut from it by arrival time
+    if len(trip_times) == 0:
+        return []
+    reached = arrival_times(G, center_node, max(trip_times))
+    node_ids, node_t, node_geoms, edge_t, edge_geoms = iso_arrays(G, reached)
+    rings = iso_rings(node_t, node_geoms, edge_t, edge_geoms, trip_times, edge_buff=edge_buff, node_buff=node_buff)
+    return iso_polys(rings,trip_times,infill)
 
-        n = nodes_gdf.buffer(node_buff).geometry
-        e = gpd.GeoSeries(edge_lines).buffer(edge_buff).geometry
-        all_gs = list(n) + list(e)
-        new_iso = gpd.GeoSeries(all_gs).unary_union
+### same isochrones from a prepared graph_arrays.GraphArrays (e.g. graph_cache.load_prepared_graph(..., as_arrays=True)) ###
+def make_iso_polys_arrays(A, center, trip_times, edge_buff=25, node_buff=50, infill=False):
+    # center is a position into A.node_ids
+    if len(trip_times) == 0:
+        return []
+    nodes, node_t = arrival_times_arrays(A, center, max(trip_times))
+    node_geoms, edge_t, edge_geoms = iso_arrays_from_arrays(A, nodes, node_t)
+    rings = iso_rings(node_t, node_geoms, edge_t, edge_geoms, trip_times, edge_buff=edge_buff, node_buff=node_buff)
+    return iso_polys(rings,trip_times,infill)
 
+### rings ordered by descending trip time ###
+def iso_polys(rings,trip_times,infill=False):
+    isochrone_polys = []
+    for trip_time in sorted(trip_times, reverse=True):
+        new_iso = rings[trip_time]
         # try to fill in surrounded areas so shapes will appear solid and
         # blocks without white space inside them
         if infill:
@@ -37,22 +49,153 @@ def make_iso_polys(G, center_node,trip_times, edge_buff=25, node_buff=50, infill
         isochrone_polys.append(new_iso)
     return isochrone_polys
 
+### shortest path travel time from center node to every node reachable within max_time ###
+def arrival_times(G, center_node, max_time, weight="time"):
+    # same search nx.ego_graph runs for a directed graph
+    with stage('shortest_path.arrival_times') as s:
+        reached = nx.single_source_dijkstra_path_length(G, center_node, cutoff=max_time, weight=weight)
+        s.count(nodes=len(reached))
+    return reached
+
+### positions and arrival times of all nodes reachable within max_time on the CSR edge arrays ###
+def arrival_times_arrays(A, center, max_time):
+    with stage('shortest_path.arrival_times') as s:
+        #### parallel edges -> the cheapest one, as dijkstra on the multigraph takes it
+        order = np.lexsort((A.time, A.v, A.u))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (np.diff(A.u[order]) != 0) | (np.diff(A.v[order]) != 0)
+        keep = order[first]
+        # csgraph drops stored zeros -> zero length edges get the smallest positive weight
+        weights = np.maximum(A.time[keep], np.finfo(float).tiny)
+        matrix = sparse.csr_matrix((weights, (A.u[keep], A.v[keep])), shape=(len(A), len(A)))
+        dist = csgraph.dijkstra(matrix, indices=center, limit=max_time)
+        nodes = np.flatnonzero(dist <= max_time)
+        s.count(nodes=len(nodes))
+    return nodes, dist[nodes]
+
+### node and edge geometries of the reached subgraph with arrival times, edges picked like iso_arrays ###
+def iso_arrays_from_arrays(A, nodes, node_t):
+    t = np.full(len(A), np.inf)
+    t[nodes] = node_t
+    edges = np.flatnonzero(np.isfinite(t[A.u]) & np.isfinite(t[A.v]))
+    #### one edge per (u,v) pair: key 0 if there is one, else the first in graph order
+    order = np.lexsort((edges, A.key[edges] != 0, A.v[edges], A.u[edges]))
+    edges = edges[order]
+    first = np.ones(len(edges), dtype=bool)
+    first[1:] = (np.diff(A.u[edges]) != 0) | (np.diff(A.v[edges]) != 0)
+    edges = edges[first]
+    node_geoms = shapely.points(A.x[nodes], A.y[nodes])
+    edge_t = np.maximum(t[A.u[edges]], t[A.v[edges]])
+    edge_geoms = A.edge_geometries(edges)
+    missing = np.array([g is None for g in edge_geoms], dtype=bool)
+    if missing.any():
+        u, v = A.u[edges[missing]], A.v[edges[missing]]
+        coords = np.stack([np.column_stack([A.x[u], A.y[u]]), np.column_stack([A.x[v], A.y[v]])], axis=1)
+        edge_geoms[missing] = shapely.linestrings(coords)
+    return node_geoms, edge_t, edge_geoms
+
+### nodes and edges of the reached subgraph as arrays with their arrival time ###
+def iso_arrays(G, reached):
+    node_ids = np.array(list(reached.keys()))
+    node_t = np.fromiter(reached.values(), dtype=float, count=len(reached))
+    x = np.array([G.nodes[n]["x"] for n in node_ids], dtype=float)
+    y = np.array([G.nodes[n]["y"] for n in node_ids], dtype=float)
+    node_geoms = shapely.points(x, y)
+    # one edge per (u,v) pair with the geometry of key 0 as the ego graph version looked it up
+    edges = {}
+    for u, v, k, geom in G.edges(list(reached.keys()), keys=True, data="geometry"):
+        if v not in reached:
+            continue
+        if (u, v) not in edges or k == 0:
+            edges[(u, v)] = geom
+    pos = {n: i for i, n in enumerate(node_ids.tolist())}
+    u_idx = np.fromiter((pos[u] for u, _ in edges), dtype=np.int64, count=len(edges))
+    v_idx = np.fromiter((pos[v] for _, v in edges), dtype=np.int64, count=len(edges))
+    edge_t = np.maximum(node_t[u_idx], node_t[v_idx])
+    edge_geoms = np.array(list(edges.values()), dtype=object)
+    missing = np.array([g is None for g in edge_geoms], dtype=bool)
+    if missing.any():
+        coords = np.stack([np.column_stack([x[u_idx[missing]], y[u_idx[missing]]]),
+                           np.column_stack([x[v_idx[missing]], y[v_idx[missing]]])], axis=1)
+        edge_geoms[missing] = shapely.linestrings(coords)
+    return node_ids, node_t, node_geoms, edge_t, edge_geoms
+
+### union of node and edge buffers per trip time, each ring grows the polygon of the next smaller one ###
+def iso_rings(node_t, node_geoms, edge_t, edge_geoms, trip_times, edge_buff=25, node_buff=50):
+    rings = {}
+    poly = None
+    lower = -np.inf
+    with stage('buffer_union.iso_rings', nodes=len(node_geoms), edges=len(edge_geoms)):
+        for trip_time in sorted(set(trip_times)):
+            node_mask = (node_t > lower) & (node_t <= trip_time)
+            edge_mask = (edge_t > lower) & (edge_t <= trip_time)
+            # quad_segs=16 matches the geopandas buffer resolution used before
+            parts = [shapely.buffer(node_geoms[node_mask], node_buff, quad_segs=16),
+                     shapely.buffer(edge_geoms[edge_mask], edge_buff, quad_segs=16)]
+            if poly is not None:
+                parts.append(np.array([poly], dtype=object))
+            poly = shapely.union_all(np.concatenate(parts))
+            rings[trip_time] = poly
+            lower = trip_time
+    return rings
+
+### project graph and add an edge attribute for time in minutes required to traverse each edge ###
+def prepare_graph(g,travel_speed,to_crs=None):
+    with stage('projection.project_graph') as s:
+        G = ox.project_graph(g,to_crs=to_crs)
+        if s:
+            s.count(nodes=len(G), edges=G.number_of_edges())
+    meters_per_minute = travel_speed * 1000 / 60  # km per hour to m per minute
+    for _, _, _, data in G.edges(data=True, keys=True):
+        data["time"] = data["length"] / meters_per_minute
+    return G
+
 ### build reachability polygon geo df ###
 def reachability_polygon(g,point,trip_times,travel_speed,to_crs=None,edge_buff=25, node_buff=50, infill=False,simplify=False):
     # NOTE: function based of https://github.com/gboeing/osmnx-examples/blob/main/notebooks/13-isolines-isochrones.ipynb
     #G = ox.graph_from_point(point[::-1],1000, network_type='walk',simplify=simplify)
     G=g
-    print('G')
-    center_node = ox.distance.nearest_nodes(G, point[0], point[1])
-    G = ox.project_graph(G,to_crs=to_crs)
-    print('proj')
-
-    # add an edge attribute for time in minutes required to traverse each edge
-    meters_per_minute = travel_speed * 1000 / 60  # km per hour to m per minute
-    for _, _, _, data in G.edges(data=True, keys=True):
-        data["time"] = data["length"] / meters_per_minute
+    with stage('shortest_path.nearest_node'):
+        center_node = ox.distance.nearest_nodes(G, point[0], point[1])
+    G = prepare_graph(G,travel_speed,to_crs=to_crs)
     isochrone_polys = make_iso_polys(G,center_node,trip_times, edge_buff=edge_buff, node_buff=node_buff, infill=infill)
     geo_s = gpd.GeoSeries(isochrone_polys)
     geo_df = gpd.GeoDataFrame(geometry=geo_s)
     geo_df = geo_df.set_crs(ox.graph_to_gdfs(G)[0].crs)
     return geo_df
+
+### worker state for batch isochrones -> the prepared graph is handed over once per process ###
+_shared_G = None
+
+def _init_worker(G):
+    global _shared_G
+    _shared_G = G
+
+def _origin_isochrones(task):
+    origin_id, center_node, trip_times, edge_buff, node_buff, infill = task
+    return origin_id, make_iso_polys(_shared_G, center_node, trip_times, edge_buff=edge_buff, node_buff=node_buff, infill=infill)
+
+### build reachability polygons for many (lon,lat) points on the same graph ###
+def reachability_polygons(g,points,trip_times,travel_speed,ids=None,to_crs=None,edge_buff=25, node_buff=50, infill=False,workers=None):
+    if ids is None:
+        ids = list(range(len(points)))
+    lon_lat = np.asarray(points, dtype=float).reshape(-1, 2)
+    # snap all origins with one nearest node query on the unprojected graph
+    center_nodes = ox.distance.nearest_nodes(g, lon_lat[:, 0], lon_lat[:, 1])
+    G = prepare_graph(g,travel_speed,to_crs=to_crs)
+    tasks = [(origin_id, center_node, trip_times, edge_buff, node_buff, infill) for origin_id, center_node in zip(ids, center_nodes)]
+    if workers == 1 or len(tasks) <= 1:
+        _init_worker(G)
+        results = list(map(_origin_isochrones, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(G,)) as pool:
+            results = list(pool.map(_origin_isochrones, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))))
+    # make_iso_polys returns the rings ordered by descending trip time
+    times = sorted(trip_times, reverse=True)
+    origin_col, time_col, geoms = [], [], []
+    for origin_id, polys in results:
+        origin_col.extend([origin_id] * len(polys))
+        time_col.extend(times)
+        geoms.extend(polys)
+    geo_df = gpd.GeoDataFrame({'origin_id': origin_col, 'trip_time': time_col}, geometry=geoms, crs=G.graph['crs'])
+    return geo_df.set_index(['origin_id', 'trip_time'])
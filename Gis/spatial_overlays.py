@@ -2,17 +2,21 @@ import geopandas as gpd
 import pandas as pd
 import numpy as np
 import datetime
+import os
 import shapely
-import osmnx as ox
-import mplleaflet
 import geo_utils as gu
-import create_shap_file as csf
+import create_shape_file as csf
+import projection
+from instrumentation import stage
+from _lazy import lazy_import
+
+spatial = lazy_import('scipy.spatial')
 
 ### create point buffer from geodf with given datum ###
 def create_point_buffer_wgs84(gdf,dist,proj=None):
-    gdf_proj = ox.project_gdf(gdf,to_crs=proj)
-    buffer = gpd.GeoDataFrame(geometry=gdf_proj.buffer(dist)).set_crs(gdf_proj.crs)
-    buffer_reprojected = ox.project_gdf(buffer,to_crs=gdf.crs)
+    coords = shapely.get_coordinates(gdf.geometry.values)
+    buffers, crs = projection.point_buffers(coords[:, 0],coords[:, 1],dist,crs=gdf.crs,proj=proj)
+    buffer_reprojected = gpd.GeoDataFrame(geometry=projection.transform_geoms(buffers,crs,gdf.crs),index=gdf.index,crs=gdf.crs)
     buffer_reprojected['place_id'] = buffer_reprojected.index
     return buffer_reprojected
 
@@ -32,7 +36,7 @@ def cluster_layer_intersection(path,df,dist=40):
     gdf_data1 = csf.load_data_in_bbox(f"{path}_polygon.shp",bbox=buffers,all_data=False)
     gdf_data2 = csf.load_data_in_bbox(f"{path}_points.shp",bbox=buffers,all_data=False)
     gdf_data1 = csf.poly_to_centroid(gdf_data1)
-    gdf_data = gdf_data2.append(gdf_data1)
+    gdf_data = pd.concat([gdf_data2, gdf_data1])
     if len(gdf_data) == 0:
         return np.array([]), gdf_data
     else:
@@ -40,6 +44,67 @@ def cluster_layer_intersection(path,df,dist=40):
         places_with_intersection = np.unique(inter.place_id)
         return places_with_intersection, inter.to_crs('EPSG:4326')
 
+### count features of every layer within dist of each dwell cluster -> one kd tree radius query per layer instead of buffer overlays ###
+def cluster_layer_counts(layers,df,dist=40,proj=None):
+    gdf = gdf_from_df(df,['center_longitude','center_latitude'])
+    gdf_proj = projection.project_gdf(gdf,to_crs=proj)
+    centers = shapely.get_coordinates(gdf_proj.geometry.values)
+    buffers = create_point_buffer_wgs84(gdf,dist)
+    counts = pd.DataFrame(index=pd.Index(gdf.place_id.values,name='place_id'))
+    places_with_intersection = {}
+    for name, path in layers.items():
+        coords = layer_points(path,buffers,gdf_proj.crs)
+        if len(coords) == 0:
+            counts[name] = 0
+        else:
+            with stage('overlay.cluster_kdtree', points=len(coords), buffers=len(centers)):
+                counts[name] = count_within(centers,coords,dist)
+        places_with_intersection[name] = counts.index.values[counts[name].values > 0]
+    return counts, places_with_intersection
+
+### number of points within dist (exact circle, boundary included) of every center, projected coordinates ###
+### the one radius test of the cluster counts -> both cluster functions agree on points near the boundary
+def count_within(centers,points,dist):
+    return spatial.cKDTree(points).query_ball_point(centers,r=dist,return_length=True)
+
+### projected coordinates of all points and polygon centroids of a layer inside bbox (gdf or bounds in the layer crs) ###
+def layer_points(path,bbox,crs):
+    coords = [np.empty((0, 2))]
+    for suffix in ('_points.shp', '_polygon.shp'):
+        if not os.path.exists(f"{path}{suffix}"):
+            continue
+        data = csf.read_layer(f"{path}{suffix}",bbox=bbox)
+        if len(data) > 0:
+            coords.append(shapely.get_coordinates(shapely.centroid(projection.transform_geoms(data.geometry.values,data.crs,crs))))
+    return np.concatenate(coords)
+
+### dwell clusters of many users (user id -> cluster df) as one wgs84 gdf ###
+def clusters_from_dfs(user_dfs,lat_lon_col_names=('center_longitude','center_latitude')):
+    gdfs = [gdf_from_df(df,list(lat_lon_col_names)).assign(user_id=user) for user, df in user_dfs.items()]
+    return pd.concat(gdfs,ignore_index=True)[['user_id','place_id','geometry']]
+
+### feature counts of every layer within the buffers of all users' dwell clusters ###
+### buffers stay projected and layers are read per grid cell of clusters, not through one bbox around everything ###
+def cluster_layer_intersections(layers,user_dfs,dist=40,cell_size=5000,proj=None):
+    gdf = clusters_from_dfs(user_dfs)
+    coords = shapely.get_coordinates(gdf.geometry.values)
+    buffers, proj = projection.point_buffers(coords[:, 0],coords[:, 1],dist,crs=gdf.crs,proj=proj)
+    x, y = projection.transform_xy(coords[:, 0],coords[:, 1],gdf.crs,proj)
+    centers = np.column_stack([x, y])
+    cells = pd.Series(np.arange(len(gdf))).groupby([np.floor(x / cell_size), np.floor(y / cell_size)]).indices
+    counts = np.zeros((len(gdf), len(layers)), dtype=np.int64)
+    for members in cells.values():
+        #### buffers only give the read window, the count itself is the exact radius test of count_within
+        bbox = tuple(shapely.total_bounds(projection.transform_geoms(buffers[members],proj,gdf.crs)))
+        for j, path in enumerate(layers.values()):
+            points = layer_points(path,bbox,proj)
+            if len(points) == 0:
+                continue
+            with stage('overlay.cluster_points', points=len(points), buffers=len(members)):
+                counts[members, j] += count_within(centers[members],points,dist)
+    index = pd.MultiIndex.from_arrays([gdf.user_id.values, gdf.place_id.values], names=['user_id','place_id'])
+    return pd.DataFrame(counts, index=index, columns=list(layers.keys()))
+
 
 
 
@@ -6,9 +6,9 @@ import numpy as np
 from matplotlib import pyplot as plt
 import seaborn as sns
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.model_selection import LeaveOneOut
 from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
+import ols_cv
+import resampling
 
 pd.set_option('display.max_columns',None)
 pd.set_option('display.max_rows',None)
@@ -30,25 +30,34 @@ def make_model(x,y,df):
     print(model.summary())
     return model
 
+### model plus bootstrap CIs and permutation p values of coefficients and LOO R² ###
+def make_model_with_resampling(x,y,df,n_boot=10000,n_perm=10000,seed=0,workers=None):
+    model = make_model(x,y,df)
+    resampled = resampling.resample(df[x],df[y],n_boot=n_boot,n_perm=n_perm,seed=seed,workers=workers,names=list(model.params.index))
+    print(resampled['summary'])
+    print(f"LOO R² {round(resampled['r2_cv'],3)}, bootstrap CI {np.round(resampled['r2_cv_ci'],3)}, permutation p {resampled['r2_cv_p_perm']:.3g}")
+    return model, resampled
+
 ### leav one out cross validation to measure model performance ###
-def leav_one_out_cv(df_features,y,columns=None):
+### OLS predictions come from one decomposition (hat matrix), other estimators are refit per left out row ###
+def leav_one_out_cv(df_features,y,columns=None,estimator=None):
     if columns == None:
         columns= list(df_features.columns)
         X = df_features[columns].copy()
     else:
         X = df_features[columns].copy()
-    model = LinearRegression()
-    loo = LeaveOneOut()
-    loo.get_n_splits(X)
-    predictions = []
-    for train_index, test_index in loo.split(X):
-        X_train, X_test = X.iloc[train_index], X.iloc[test_index]
-        y_train, y_test = y.iloc[train_index], y.iloc[test_index]
-        model.fit(X_train,y_train)
-        y_pred = model.predict(X_test)
-        predictions.append([y_pred[0],y_test.iloc[0]])
-    arr = np.array(predictions)
-    score = r2_score(arr[:,1],arr[:,0])
+    pred, score = ols_cv.cross_validate(X,y,estimator)
+    arr = np.stack([pred,np.asarray(y,dtype=float)],axis=1)
+    return arr, score
+
+### k fold cross validation, same output as leav_one_out_cv ###
+def k_fold_cv(df_features,y,columns=None,n_splits=5,seed=0,estimator=None):
+    if columns == None:
+        columns= list(df_features.columns)
+    X = df_features[columns].copy()
+    folds = ols_cv.kfold_labels(len(X),n_splits,seed=seed)
+    pred, score = ols_cv.cross_validate(X,y,estimator,folds)
+    arr = np.stack([pred,np.asarray(y,dtype=float)],axis=1)
     return arr, score
 #################### read data ######################################
 #####################################################################
@@ -0,0 +1,87 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+
+#################### closed form cross validation for OLS ###########
+#####################################################################
+
+LEVERAGE_TOL = 1e-10
+
+### design matrix with intercept column like LinearRegression(fit_intercept=True) ###
+def design_matrix(X,intercept=True):
+    X = np.asarray(X, dtype=float)
+    if X.ndim == 1:
+        X = X[:, None]
+    if intercept:
+        X = np.column_stack([np.ones(len(X)), X])
+    return X
+
+### orthonormal basis of the column space -> hat matrix H = U @ U.T, rank deficient designs like lstsq ###
+def column_basis(X):
+    U, s, _ = np.linalg.svd(X, full_matrices=False)
+    tol = s.max() * max(X.shape) * np.finfo(float).eps if len(s) else 0
+    return U[:, s > tol]
+
+### fold labels for k fold cv, seeded shuffle ###
+def kfold_labels(n,n_splits=5,shuffle=True,seed=0):
+    order = np.random.default_rng(seed).permutation(n) if shuffle else np.arange(n)
+    labels = np.empty(n, dtype=np.int64)
+    labels[order] = np.arange(n) % n_splits
+    return labels
+
+### held out predictions of all folds from one decomposition ###
+### loo: y - e / (1 - h), k fold: y_S - (I - H_SS)^-1 e_S for each fold S ###
+### rows with leverage ~1 (the fold alone spans a direction of the design) are refitted instead of divided by ~0
+def cv_predictions(X,y,folds=None,intercept=True):
+    U = column_basis(design_matrix(X,intercept))
+    y = np.asarray(y, dtype=float)
+    y2 = y.reshape(len(y), -1)
+    resid = y2 - U @ (U.T @ y2)
+    if folds is None:
+        folds = np.arange(len(y))
+        h = np.einsum('ij,ij->i', U, U)
+        refit = np.flatnonzero(h >= 1 - LEVERAGE_TOL)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pred = y2 - resid / (1 - h)[:, None]
+    else:
+        folds = np.asarray(folds)
+        pred = np.empty_like(y2)
+        refit = []
+        for fold in np.unique(folds):
+            idx = np.flatnonzero(folds == fold)
+            U_s = U[idx]
+            I_H = np.eye(len(idx)) - U_s @ U_s.T
+            if np.linalg.eigvalsh(I_H)[0] <= LEVERAGE_TOL:
+                refit.append(fold)
+                continue
+            pred[idx] = y2[idx] - np.linalg.solve(I_H, resid[idx])
+    if len(refit):
+        estimator = LinearRegression(fit_intercept=intercept)
+        rows = np.isin(folds, refit)
+        pred[rows] = refit_predictions(estimator,design_matrix(X,False),y2,folds,refit)[rows]
+    return pred.reshape(y.shape)
+
+### held out predictions by refitting the estimator per fold, for estimators without closed form ###
+### only: the folds to refit (all by default), rows of the other folds are left unset
+def refit_predictions(estimator,X,y,folds=None,only=None):
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    folds = np.arange(len(X)) if folds is None else np.asarray(folds)
+    pred = np.empty_like(y)
+    for fold in (np.unique(folds) if only is None else only):
+        test = folds == fold
+        estimator.fit(X[~test], y[~test])
+        pred[test] = estimator.predict(X[test]).reshape(pred[test].shape)
+    return pred
+
+### closed form is exact for plain least squares only ###
+def is_ols(estimator):
+    return estimator is None or (type(estimator) is LinearRegression and not estimator.positive)
+
+### cv predictions and R² -> closed form for OLS, refit loop otherwise ###
+def cross_validate(X,y,estimator=None,folds=None):
+    if is_ols(estimator):
+        intercept = True if estimator is None else estimator.fit_intercept
+        pred = cv_predictions(X,y,folds,intercept)
+    else:
+        pred = refit_predictions(estimator,X,y,folds)
+    return pred, r2_score(np.asarray(y, dtype=float),pred)
@@ -0,0 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import ols_cv
+
+#################### bootstrap / permutation for OLS ################
+#####################################################################
+### every replicate of a chunk is solved at once: stacked designs (chunk x n x p) and batched pseudo inverses
+
+CHUNK = 1000
+
+_shared = {}
+
+### coefficients, LOO R² of stacked designs Z (c x n x p) and targets Y (c x n) ###
+def batched_ols(Z,Y):
+    P = np.linalg.pinv(Z)
+    coefs = np.einsum('cpn,cn->cp', P, Y)
+    fitted = np.einsum('cnp,cp->cn', Z, coefs)
+    h = np.einsum('cnp,cpn->cn', Z, P)
+    sst = ((Y - Y.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        press = (((Y - fitted) / (1 - h)) ** 2).sum(axis=1)
+        r2_cv = np.where(h.max(axis=1) < 1 - ols_cv.LEVERAGE_TOL, 1 - press / sst, np.nan)
+    return coefs, r2_cv
+
+def _init_worker(Z,y):
+    _shared.update(Z=Z, y=y)
+
+### one chunk of bootstrap replicates (rows drawn with replacement) ###
+def _boot_chunk(task):
+    seed, size = task
+    Z, y = _shared['Z'], _shared['y']
+    idx = np.random.default_rng(seed).integers(0, len(y), size=(size, len(y)))
+    return batched_ols(Z[idx],y[idx])
+
+### one chunk of permutation replicates (y shuffled, design fixed -> one pseudo inverse for all) ###
+def _perm_chunk(task):
+    seed, size = task
+    Z, y = _shared['Z'], _shared['y']
+    rng = np.random.default_rng(seed)
+    Y = y[np.argsort(rng.random((size, len(y))), axis=1)]
+    U = ols_cv.column_basis(Z)
+    coefs = Y @ np.linalg.pinv(Z).T
+    resid = Y - (Y @ U) @ U.T
+    h = np.einsum('ij,ij->i', U, U)
+    sst = ((Y - Y.mean(axis=1, keepdims=True)) ** 2).sum(axis=1)
+    #### same leverage guard as batched_ols, h does not change under permutation -> all or none are nan
+    if h.max() >= 1 - ols_cv.LEVERAGE_TOL:
+        return coefs, np.full(size, np.nan)
+    return coefs, 1 - ((resid / (1 - h)) ** 2).sum(axis=1) / sst
+
+### chunk tasks with independent seeds -> same result for any number of workers ###
+def _tasks(n_rep,chunk,seed):
+    sizes = [min(chunk, n_rep - start) for start in range(0, n_rep, chunk)]
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+def _run(fn,Z,y,n_rep,chunk,seed,workers):
+    tasks = _tasks(n_rep,chunk,seed)
+    if workers == 1:
+        _init_worker(Z,y)
+        results = list(map(fn, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker, initargs=(Z,y)) as pool:
+            results = list(pool.map(fn, tasks))
+    if len(results) == 0:
+        return np.empty((0, Z.shape[1])), np.empty(0)
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+### bootstrap CIs and permutation p values of the coefficients and the LOO R² ###
+### the bootstrap LOO R² is optimistic: a row drawn twice stays in the fit that predicts its held out copy,
+### so r2_cv_ci is about the spread of the score, not an unbiased interval around r2_cv
+### replicates with a leverage ~1 row have no LOO R² (nan) and are left out of r2_cv_ci and r2_cv_p_perm
+def resample(X,y,n_boot=10000,n_perm=10000,seed=0,chunk=CHUNK,workers=None,alpha=0.05,names=None):
+    Z = ols_cv.design_matrix(X)
+    y = np.asarray(y, dtype=float).reshape(len(Z))
+    names = ['Intercept'] + list(X.columns) if names is None else list(names)
+    coefs = np.linalg.pinv(Z) @ y
+    r2_cv = ols_cv.cross_validate(X,y)[1]
+    boot_coefs, boot_r2 = _run(_boot_chunk,Z,y,n_boot,chunk,seed,workers)
+    perm_coefs, perm_r2 = _run(_perm_chunk,Z,y,n_perm,chunk,None if seed is None else seed + 1,workers)
+    boot_coefs = pd.DataFrame(boot_coefs, columns=names)
+    perm_coefs = pd.DataFrame(perm_coefs, columns=names)
+    ci = boot_coefs.quantile([alpha / 2, 1 - alpha / 2]).T
+    ci.columns = ['ci_low', 'ci_high']
+    summary = pd.DataFrame({'coef': coefs}, index=names).join(ci)
+    #### two sided, the observed statistic counts as one permutation
+    summary['p_perm'] = ((np.abs(perm_coefs.values) >= np.abs(coefs)).sum(axis=0) + 1) / (len(perm_coefs) + 1)
+    return {'summary': summary,
+            'r2_cv': r2_cv,
+            'r2_cv_ci': tuple(np.nanquantile(boot_r2, [alpha / 2, 1 - alpha / 2])) if len(boot_r2) else (np.nan, np.nan),
+            'r2_cv_p_perm': ((perm_r2 >= r2_cv).sum() + 1) / (np.isfinite(perm_r2).sum() + 1),
+            'boot_coefs': boot_coefs,
+            'boot_r2_cv': boot_r2,
+            'perm_coefs': perm_coefs,
+            'perm_r2_cv': perm_r2}
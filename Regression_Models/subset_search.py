@@ -0,0 +1,136 @@
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+#################### feature subset search by LOO R² ################
+#####################################################################
+### subsets are grown one feature at a time (depth first, features in column order) and every
+### extension adds one orthonormal column to the QR basis of the design -> fitted values and
+### hat diagonal are updated in O(n) per column instead of refitting each candidate
+
+_shared = {}
+
+### orthonormal column for z against basis W (gram schmidt, twice for stability), None if z is collinear ###
+def extend_basis(W,z,tol=1e-8):
+    w = z - W @ (W.T @ z)
+    w = w - W @ (W.T @ w)
+    norm = np.linalg.norm(w)
+    if norm <= tol * max(np.linalg.norm(z), 1.0):
+        return None
+    return w / norm
+
+### basis, fitted values and hat diagonal of the intercept only model ###
+def intercept_state(y):
+    n = len(y)
+    W = np.full((n, 1), 1 / np.sqrt(n))
+    return W, np.full(n, y.mean()), np.full(n, 1 / n)
+
+### LOO R² from residuals and hat diagonal of one fit, -inf if a row has leverage 1 ###
+def loo_r2(y,fitted,h,sst):
+    if h.max() >= 1 - 1e-10:
+        return -np.inf
+    press = (((y - fitted) / (1 - h)) ** 2).sum()
+    return 1 - press / sst
+
+### in sample R² when all features from start on are added -> upper bound of the LOO R² of every subset in the branch ###
+def branch_bound(Z,y,W,fitted,start,sst):
+    rest = Z[:, start:]
+    rest = rest - W @ (W.T @ rest)
+    r = y - fitted
+    coef = np.linalg.lstsq(rest, r, rcond=None)[0]
+    return 1 - ((r - rest @ coef) ** 2).sum() / sst
+
+def _push(heap,top,item):
+    if len(heap) < top:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+def _grow(Z,y,sst,k,top,prune,subset,W,fitted,h,start,heap):
+    if len(subset) == k:
+        r2 = loo_r2(y,fitted,h,sst)
+        if np.isfinite(r2):
+            _push(heap,top,(r2, subset))
+        return
+    if prune and len(heap) == top and branch_bound(Z,y,W,fitted,start,sst) <= heap[0][0]:
+        return
+    for j in range(start, Z.shape[1] - (k - len(subset)) + 1):
+        w = extend_basis(W,Z[:, j])
+        if w is None:
+            continue
+        _grow(Z,y,sst,k,top,prune,subset + (j,),np.column_stack([W, w]),fitted + w * (w @ y),h + w * w,j + 1,heap)
+
+def _init_worker(Z,y,k,top,prune):
+    _shared.update(Z=Z, y=y, k=k, top=top, prune=prune)
+
+### all k subsets whose smallest feature is first -> one task per first feature ###
+def _search_first(first):
+    Z, y, k, top, prune = _shared['Z'], _shared['y'], _shared['k'], _shared['top'], _shared['prune']
+    sst = ((y - y.mean()) ** 2).sum()
+    W, fitted, h = intercept_state(y)
+    heap = []
+    w = extend_basis(W,Z[:, first])
+    if w is not None:
+        _grow(Z,y,sst,k,top,prune,(first,),np.column_stack([W, w]),fitted + w * (w @ y),h + w * w,first + 1,heap)
+    return heap
+
+def _result_df(items,columns):
+    items = sorted(items, reverse=True)
+    return pd.DataFrame({'r2_cv': [r2 for r2, _ in items],
+                         'features': [tuple(columns[j] for j in subset) for _, subset in items]})
+
+def _inputs(df_features,y,columns):
+    columns = list(df_features.columns) if columns == None else list(columns)
+    Z = np.asarray(df_features[columns], dtype=float)
+    y = np.asarray(y, dtype=float).reshape(len(Z))
+    return columns, Z, y
+
+### exhaustive search, yields the running top N after every finished first feature branch ###
+def iter_subset_search(df_features,y,k=5,top=20,columns=None,workers=None,prune=True):
+    columns, Z, y = _inputs(df_features,y,columns)
+    firsts = range(Z.shape[1] - k + 1)
+    best = []
+    if workers == 1:
+        _init_worker(Z,y,k,top,prune)
+        for first in firsts:
+            for item in _search_first(first):
+                _push(best,top,item)
+            yield _result_df(best,columns)
+        return
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(Z,y,k,top,prune)) as pool:
+        for future in as_completed([pool.submit(_search_first, first) for first in firsts]):
+            for item in future.result():
+                _push(best,top,item)
+            yield _result_df(best,columns)
+
+### top N feature subsets of size k by LOO R² ###
+def subset_search(df_features,y,k=5,top=20,columns=None,workers=None,prune=True):
+    result = _result_df([],list(df_features.columns) if columns == None else list(columns))
+    for result in iter_subset_search(df_features,y,k,top,columns,workers,prune):
+        pass
+    return result
+
+### bounded beam: keep the beam_width best subsets of every size and only extend those ###
+def beam_search(df_features,y,k=5,beam_width=50,top=20,columns=None):
+    columns, Z, y = _inputs(df_features,y,columns)
+    sst = ((y - y.mean()) ** 2).sum()
+    beam = [((),) + intercept_state(y)]
+    for size in range(1, k + 1):
+        candidates = {}
+        for subset, W, fitted, h in beam:
+            for j in range(Z.shape[1]):
+                key = tuple(sorted(subset + (j,)))
+                if j in subset or key in candidates:
+                    continue
+                w = extend_basis(W,Z[:, j])
+                if w is None:
+                    continue
+                state = (np.column_stack([W, w]), fitted + w * (w @ y), h + w * w)
+                candidates[key] = (loo_r2(y,state[1],state[2],sst),) + state
+        ranked = sorted(candidates.items(), key=lambda item: (item[1][0], item[0]), reverse=True)[:beam_width]
+        beam = [(key,) + value[1:] for key, value in ranked]
+    return _result_df([(value[0], key) for key, value in ranked[:top] if np.isfinite(value[0])],columns)
@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GIS = os.path.join(ROOT, 'Gis')
+
+##### import time of the core lifespace / overlay modules in a fresh interpreter #####
+### the third party core (numpy, pandas, geopandas, shapely, pyproj) is measured on its own as baseline,
+### a module is over budget if it adds more than --budget seconds on top or pulls in one of the heavy modules
+
+MODULES = ['projection', 'day_overlap', 'geo_utils', 'lifespace', 'gps_stream', 'spatial_overlays', 'indicator_pipeline']
+BASELINE = 'numpy, pandas, geopandas, shapely, pyproj'
+HEAVY = ['osmnx', 'networkx', 'matplotlib', 'mplleaflet', 'descartes', 'scipy.spatial']
+BUDGET = 0.3  # seconds on top of the baseline
+
+SNIPPET = '''
+import json, sys, time
+sys.path.insert(0, {gis!r})
+start = time.perf_counter()
+import {modules}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+### seconds and loaded heavy modules of one import statement, minimum over fresh interpreters ###
+def measure(modules,repeat=5):
+    code = SNIPPET.format(gis=GIS, modules=modules, heavy=HEAVY)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=ROOT).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+    seconds = [r['seconds'] for r in runs]
+    return {'min': min(seconds), 'median': statistics.median(seconds), 'heavy': runs[0]['heavy']}
+
+def run(modules=MODULES,budget=BUDGET,repeat=5):
+    baseline = measure(BASELINE,repeat)
+    print(f"{'baseline':20s} {baseline['min']:7.3f}s")
+    results = []
+    for name in modules:
+        r = measure(name,repeat)
+        r.update(module=name, extra=r['min'] - baseline['min'])
+        r['ok'] = r['extra'] <= budget and not r['heavy']
+        print(f"{name:20s} {r['min']:7.3f}s  {r['extra']:+.3f}s  {'ok' if r['ok'] else 'OVER BUDGET'} {' '.join(r['heavy'])}")
+        results.append(r)
+    return baseline, results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='import time budget of the core Gis modules')
+    parser.add_argument('--modules', nargs='*', default=MODULES)
+    parser.add_argument('--budget', type=float, default=BUDGET, help='allowed seconds on top of the baseline')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+    _, results = run(args.modules,args.budget,args.repeat)
+    return 0 if all(r['ok'] for r in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Gis'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+import synthetic
+
+##### size sweeps, quick for a check before a commit, full for a comparison between versions #####
+SWEEPS = {'quick': {'create_convex_hulls': [10, 30],
+                    'RevisitedLS': [10, 30],
+                    'day_convex_overlapping': [10, 30],
+                    'make_iso_polys': [('grid', 15), ('planar', 300)],
+                    'load_graph_in_bbox': [15, 30],
+                    'cluster_layer_intersection': [500, 2000]},
+          'full': {'create_convex_hulls': [10, 30, 100, 300],
+                   'RevisitedLS': [10, 30, 100, 300],
+                   'day_convex_overlapping': [10, 30, 100],
+                   'make_iso_polys': [('grid', 15), ('grid', 30), ('grid', 60), ('planar', 300), ('planar', 1000), ('planar', 3000)],
+                   'load_graph_in_bbox': [15, 30, 60],
+                   'cluster_layer_intersection': [500, 2000, 10000]}}
+
+FIXES_PER_DAY = 500
+TRIP_TIMES = [5, 10, 15]
+TRAVEL_SPEED = 4.5
+
+#################### setups: size -> (function, args) ##############
+### inputs are built outside of the measured call
+
+def setup_convex_hulls(days,workdir):
+    import geo_utils as gu
+    gdf = gu.gdf_from_df(synthetic.gps_tracks(days=days,fixes_per_day=FIXES_PER_DAY),['latitude','longitude'])
+    return gu.create_convex_hulls, (gdf,)
+
+def _hulls(days):
+    import geo_utils as gu
+    gdf = gu.gdf_from_df(synthetic.gps_tracks(days=days,fixes_per_day=FIXES_PER_DAY),['latitude','longitude'])
+    hulls, dates = gu.create_convex_hulls(gdf)
+    hulls, _, dates = gu.check_samples(hulls,pd.DataFrame(index=dates))
+    return hulls, dates
+
+def setup_revisited(days,workdir):
+    import geo_utils as gu
+    return gu.RevisitedLS, _hulls(days)
+
+def setup_day_overlap(days,workdir):
+    import geo_utils as gu
+    return gu.day_convex_overlapping, _hulls(days)
+
+def setup_iso_polys(size,workdir):
+    import reachability
+    kind, n = size
+    G = synthetic.grid_graph(n) if kind == 'grid' else synthetic.planar_graph(n)
+    center = synthetic.center_node(G)
+    G = reachability.prepare_graph(G,TRAVEL_SPEED)
+    return reachability.make_iso_polys, (G, center, TRIP_TIMES)
+
+def setup_graph_in_bbox(n,workdir):
+    import create_shape_file as csf
+    path = synthetic.write_graph_shapefiles(synthetic.grid_graph(n),f'{workdir}/grid_{n}')
+    return csf.load_graph_in_bbox, (path, synthetic.CENTER, 500)
+
+def setup_cluster_layer(n_features,workdir):
+    import spatial_overlays as so
+    prefix = synthetic.poi_layer(f'{workdir}/poi_{n_features}',n_points=n_features,n_polygons=n_features // 2)
+    return so.cluster_layer_intersection, (prefix, synthetic.dwell_clusters(), 40)
+
+BENCHMARKS = {'create_convex_hulls': setup_convex_hulls,
+              'RevisitedLS': setup_revisited,
+              'day_convex_overlapping': setup_day_overlap,
+              'make_iso_polys': setup_iso_polys,
+              'load_graph_in_bbox': setup_graph_in_bbox,
+              'cluster_layer_intersection': setup_cluster_layer}
+
+#################### measuring #####################################
+
+### wall times of repeat calls, then one extra call under tracemalloc for the peak of python/numpy allocations ###
+def measure(fn,args,repeat=3):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'time_min': min(times), 'time_median': statistics.median(times), 'peak_mb': peak / 1024 ** 2}
+
+def run(names,sweep='quick',repeat=3):
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in names:
+            for size in SWEEPS[sweep][name]:
+                record = {'benchmark': name, 'size': list(size) if isinstance(size, tuple) else size}
+                try:
+                    fn, args = BENCHMARKS[name](size,workdir)
+                    record.update(measure(fn,args,repeat))
+                except Exception as e:  # a broken function should not stop the sweep
+                    record['error'] = f"{type(e).__name__}: {e}"
+                print(json.dumps(record))
+                results.append(record)
+    return results
+
+def metadata():
+    import numpy, pandas, shapely, geopandas, networkx
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {'commit': commit or None, 'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'versions': {m.__name__: m.__version__ for m in (numpy, pandas, shapely, geopandas, networkx)}}
+
+### ratio of median times against a baseline file, > threshold counts as regression ###
+### a benchmark that fails now but had a timing in the baseline is a regression as well
+def compare(results,baseline,threshold=1.2):
+    base = {(r['benchmark'], json.dumps(r['size'])): r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+    for r in results:
+        b = base.get((r['benchmark'], json.dumps(r['size'])))
+        if b is None:
+            continue
+        if 'error' in r:
+            print(f"{r['benchmark']:28s} {json.dumps(r['size']):16s} {b['time_median']:9.4f}s -> {r['error']}")
+            regressions.append(r)
+            continue
+        ratio = r['time_median'] / b['time_median']
+        print(f"{r['benchmark']:28s} {json.dumps(r['size']):16s} {b['time_median']:9.4f}s -> {r['time_median']:9.4f}s  x{ratio:.2f}")
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='time and memory sweeps on synthetic data')
+    parser.add_argument('--sweep', choices=list(SWEEPS), default='quick')
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--out', default=None, help='json file for the results')
+    parser.add_argument('--baseline', default=None, help='results json of an older version to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2)
+    args = parser.parse_args(argv)
+    output = {'meta': metadata(), 'sweep': args.sweep, 'results': run(args.only,args.sweep,args.repeat)}
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(output, f, indent=1)
+    status = 0
+    errors = [r for r in output['results'] if 'error' in r]
+    if errors:
+        print(f"{len(errors)} benchmarks failed")
+        status = 1
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(output['results'],json.load(f),args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks failed or slower than x{args.threshold}")
+            status = 1
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
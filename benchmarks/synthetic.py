@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import networkx as nx
+import shapely
+from scipy.spatial import Delaunay
+
+##### deterministic synthetic inputs, nothing is downloaded #####
+
+CENTER = (13.40, 52.52)  # lon, lat (Berlin)
+EARTH_RADIUS = 6_371_009
+
+### great circle distance in meters between lon/lat arrays ###
+def haversine(lon1,lat1,lon2,lat2):
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+### meters -> degrees around center ###
+def meters_to_degrees(dx,dy,center=CENTER):
+    return dx / (111_320 * np.cos(np.radians(center[1]))), dy / 111_320
+
+### gps fixes of one user: every day visits a few of n_places anchors (home is visited daily) with gps jitter ###
+def gps_tracks(days=30,fixes_per_day=500,spread=5000,n_places=15,jitter=30,center=CENTER,seed=0):
+    rng = np.random.default_rng(seed)
+    anchors = np.column_stack(meters_to_degrees(*rng.normal(0, spread / 2, size=(2, n_places)), center)) + center
+    frames = []
+    for day in range(days):
+        visited = np.concatenate([[0], rng.choice(np.arange(1, n_places), size=rng.integers(1, 5), replace=False)])
+        which = visited[rng.integers(0, len(visited), fixes_per_day)]
+        dx, dy = meters_to_degrees(*rng.normal(0, jitter, size=(2, fixes_per_day)), center)
+        seconds = np.sort(rng.integers(0, 86_400, fixes_per_day))
+        frames.append(pd.DataFrame({'latitude': anchors[which, 1] + dy, 'longitude': anchors[which, 0] + dx,
+                                    'tracked_at_date': pd.Timestamp('2021-05-01') + pd.Timedelta(days=day) + pd.to_timedelta(seconds, unit='s')}))
+    return pd.concat(frames, ignore_index=True)
+
+### dwell clusters (one row per visit) like the input of spatial_overlays.gdf_from_df ###
+def dwell_clusters(n_places=50,n_visits=200,spread=5000,center=CENTER,seed=0):
+    rng = np.random.default_rng(seed)
+    lon, lat = np.array(center)[:, None] + np.array(meters_to_degrees(*rng.normal(0, spread / 2, size=(2, n_places)), center))
+    place = rng.integers(0, n_places, n_visits)
+    begin = pd.Timestamp('2021-05-01') + pd.to_timedelta(np.sort(rng.integers(0, 30 * 86_400, n_visits)), unit='s')
+    return pd.DataFrame({'center_longitude': lon[place], 'center_latitude': lat[place], 'place_id': place,
+                         'begin': begin, 'end': begin + pd.Timedelta(minutes=30)})
+
+### walk graph shaped like an unsimplified osmnx graph: both directions per street, x/y, length, osmid, street_count ###
+def graph_from_edges(lon,lat,edges,ways=None):
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for i in range(len(lon)):
+        G.add_node(i, x=float(lon[i]), y=float(lat[i]))
+    u, v = edges[:, 0], edges[:, 1]
+    length = haversine(lon[u], lat[u], lon[v], lat[v])
+    ways = np.arange(len(edges)) if ways is None else ways
+    for a, b, l, w in zip(u.tolist(), v.tolist(), length.tolist(), ways.tolist()):
+        attrs = {'osmid': int(w), 'length': l, 'oneway': False, 'highway': 'residential'}
+        G.add_edge(a, b, **attrs)
+        G.add_edge(b, a, **attrs)
+    degree = np.bincount(np.concatenate([u, v]), minlength=len(lon))
+    nx.set_node_attributes(G, dict(enumerate(degree.tolist())), 'street_count')
+    return G
+
+### n x n street grid, one osm way per grid line ###
+def grid_graph(n=20,spacing=100,center=CENTER,seed=0):
+    rng = np.random.default_rng(seed)
+    i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+    dx, dy = meters_to_degrees((j.ravel() - n / 2) * spacing + rng.normal(0, spacing / 20, n * n),
+                               (i.ravel() - n / 2) * spacing + rng.normal(0, spacing / 20, n * n), center)
+    ids = np.arange(n * n).reshape(n, n)
+    horizontal = np.column_stack([ids[:, :-1].ravel(), ids[:, 1:].ravel()])
+    vertical = np.column_stack([ids[:-1, :].ravel(), ids[1:, :].ravel()])
+    ways = np.concatenate([np.repeat(np.arange(n), n - 1), n + np.tile(np.arange(n), n - 1)])
+    return graph_from_edges(center[0] + dx, center[1] + dy, np.concatenate([horizontal, vertical]), ways)
+
+### random planar graph: delaunay triangulation of random nodes with a share of the edges dropped ###
+def planar_graph(n_nodes=400,spread=2000,drop=0.3,center=CENTER,seed=0):
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(-spread / 2, spread / 2, size=(n_nodes, 2))
+    tri = Delaunay(xy).simplices
+    edges = np.sort(np.concatenate([tri[:, [0, 1]], tri[:, [1, 2]], tri[:, [0, 2]]]), axis=1)
+    edges = np.unique(edges, axis=0)
+    edges = edges[rng.random(len(edges)) >= drop]
+    dx, dy = meters_to_degrees(xy[:, 0], xy[:, 1], center)
+    return graph_from_edges(center[0] + dx, center[1] + dy, edges)
+
+### node closest to the center of the graph ###
+def center_node(G,center=CENTER):
+    nodes = np.array(list(G.nodes))
+    x = np.array([G.nodes[n]['x'] for n in nodes])
+    y = np.array([G.nodes[n]['y'] for n in nodes])
+    return nodes[np.argmin(haversine(x, y, center[0], center[1]))].item()
+
+### nodes.shp / edges.shp like create_shape_file.convert_G ###
+def write_graph_shapefiles(G,path):
+    import osmnx as ox
+    os.makedirs(path, exist_ok=True)
+    nodes, edges = ox.graph_to_gdfs(G)
+    nodes.to_file(f'{path}/nodes.shp', driver='ESRI Shapefile')
+    edges.to_file(f'{path}/edges.shp', driver='ESRI Shapefile')
+    return path
+
+### poi layer as written by create_shape_file.save: {prefix}_points.shp and {prefix}_polygon.shp ###
+def poi_layer(prefix,n_points=1000,n_polygons=500,spread=5000,size=20,center=CENTER,seed=0):
+    rng = np.random.default_rng(seed)
+    lon, lat = np.array(center)[:, None] + np.array(meters_to_degrees(*rng.uniform(-spread / 2, spread / 2, size=(2, n_points)), center))
+    gpd.GeoDataFrame({'geom_type': ['node'] * n_points, 'amenity': 'pharmacy'},
+                     geometry=shapely.points(lon, lat), crs='epsg:4326').to_file(f'{prefix}_points.shp')
+    plon, plat = np.array(center)[:, None] + np.array(meters_to_degrees(*rng.uniform(-spread / 2, spread / 2, size=(2, n_polygons)), center))
+    radius = meters_to_degrees(size, size, center)[1]
+    gpd.GeoDataFrame({'geom_type': ['way'] * n_polygons, 'amenity': 'hospital'},
+                     geometry=shapely.buffer(shapely.points(plon, plat), radius, quad_segs=4), crs='epsg:4326').to_file(f'{prefix}_polygon.shp')
+    return prefix
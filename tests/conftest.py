@@ -0,0 +1,29 @@
+import os
+import sys
+
+import networkx as nx
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'Gis'))
+sys.path.insert(0, os.path.join(ROOT, 'Regression_Models'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+
+### 3 x 3 street grid around Berlin shaped like an unsimplified osmnx walk graph ###
+@pytest.fixture
+def small_graph():
+    G = nx.MultiDiGraph(crs='epsg:4326', simplified=False, created_with='osmnx 1.9.3')
+    for i in range(3):
+        for j in range(3):
+            G.add_node(i * 3 + j, x=13.40 + j * 0.001, y=52.52 + i * 0.001, street_count=2)
+    ways = 0
+    for i in range(3):
+        for j in range(3):
+            n = i * 3 + j
+            for m in ([n + 1] if j < 2 else []) + ([n + 3] if i < 2 else []):
+                attrs = {'osmid': ways, 'length': 80.0, 'oneway': False, 'highway': 'residential'}
+                G.add_edge(n, m, **attrs)
+                G.add_edge(m, n, **attrs)
+                ways += 1
+    return G
@@ -0,0 +1,67 @@
+import os
+
+import geopandas as gpd
+import osmnx as ox
+
+import create_shape_file as csf
+
+OSM_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+ <node id="1" lat="52.5200" lon="13.4000"><tag k="shop" v="bakery"/><tag k="name" v="Baker"/></node>
+ <node id="2" lat="52.5201" lon="13.4003"><tag k="shop" v="chemist"/><tag k="amenity" v="pharmacy"/></node>
+ <node id="3" lat="52.5203" lon="13.4006"><tag k="amenity" v="doctors"/></node>
+ <node id="4" lat="52.5205" lon="13.4009"><tag k="amenity" v="bench"/></node>
+ <node id="5" lat="52.5210" lon="13.4000"/>
+ <node id="6" lat="52.5210" lon="13.4010"/>
+ <node id="7" lat="52.5220" lon="13.4010"/>
+ <node id="8" lat="52.5220" lon="13.4000"/>
+ <node id="9" lat="52.5230" lon="13.4020"/>
+ <node id="10" lat="52.5230" lon="13.4030"/>
+ <node id="11" lat="52.5240" lon="13.4030"/>
+ <way id="20"><nd ref="5"/><nd ref="6"/><nd ref="7"/><nd ref="8"/><nd ref="5"/><tag k="leisure" v="park"/><tag k="name" v="Park"/></way>
+ <node id="12" lat="52.5250" lon="13.4000"/>
+ <node id="13" lat="52.5250" lon="13.4010"/>
+ <node id="14" lat="52.5260" lon="13.4010"/>
+ <way id="21"><nd ref="9"/><nd ref="10"/><nd ref="11"/><nd ref="9"/><tag k="shop" v="mall"/><tag k="amenity" v="doctors"/></way>
+ <way id="22"><nd ref="12"/><nd ref="13"/><nd ref="14"/><nd ref="12"/><tag k="amenity" v="pharmacy"/><tag k="shop" v="chemist"/></way>
+</osm>
+'''
+
+THEMES = {'Green_layer_test': {'leisure': ['park', 'garden']},
+          'Shop_layer_test': {'shop': True},
+          'Health_layer_test': {'amenity': ['pharmacy', 'doctors']}}
+
+
+def _layers(path):
+    layers = {}
+    for name in sorted(os.listdir(path)):
+        if name.endswith('.shp'):
+            gdf = gpd.read_file(os.path.join(path, name))
+            layers[name] = gdf.sort_values(list(gdf.columns.drop('geometry'))).reset_index(drop=True)
+    return layers
+
+
+### one query for all themes writes the same layers as one get_osm_for_place query per theme ###
+def test_themes_from_one_query_match_one_query_per_theme(monkeypatch, tmp_path):
+    source = tmp_path / 'extract.osm'
+    source.write_text(OSM_XML)
+    queries = []
+    def from_place(place, tags):
+        queries.append(tags)
+        return ox.features.features_from_xml(str(source), tags=tags)
+    monkeypatch.setattr(ox.geometries, 'geometries_from_place', from_place)
+    for run in ('per_theme', 'themes'):
+        os.makedirs(tmp_path / run)
+        monkeypatch.chdir(tmp_path / run)
+        if run == 'per_theme':
+            for layer_name, tags in THEMES.items():
+                csf.get_osm_for_place(['Berlin'], tags, extra=['name'], layer_name=layer_name)
+        else:
+            csf.get_osm_for_themes(['Berlin'], THEMES, extra=['name'])
+    assert len(queries) == len(THEMES) + 1
+    per_theme, themes = _layers(tmp_path / 'per_theme' / 'Gis_layers'), _layers(tmp_path / 'themes' / 'Gis_layers')
+    assert per_theme.keys() == themes.keys() and len(themes) >= 4
+    for name, gdf in per_theme.items():
+        assert list(themes[name].columns) == list(gdf.columns)
+        assert themes[name].drop(columns='geometry').equals(gdf.drop(columns='geometry'))
+        assert themes[name].geometry.geom_equals(gdf.geometry).all()
@@ -0,0 +1,45 @@
+import warnings
+
+import numpy as np
+import shapely
+
+from day_overlap import DayOverlapIndex
+
+
+### overlapping, touching and separate days -> same index whether built at once or day by day ###
+def test_bulk_and_incremental_index_agree():
+    geoms = np.array([shapely.box(0, 0, 10, 10), shapely.box(5, 5, 15, 15), shapely.box(10, 0, 20, 5),
+                      shapely.box(30, 30, 40, 40)], dtype=object)
+    days = ['d0', 'd1', 'd2', 'd3']
+    bulk = DayOverlapIndex.from_geoms(days, geoms)
+    incremental = DayOverlapIndex()
+    for day, geom in zip(days, geoms):
+        incremental.add(day, geom)
+    assert {i: set(p) for i, p in bulk.pairs.items()} == {i: set(p) for i, p in incremental.pairs.items()}
+    assert 2 in bulk.pairs[0]  # d0 and d2 only touch
+    np.testing.assert_allclose(bulk.intersection_matrix().values, incremental.intersection_matrix().values)
+    np.testing.assert_allclose(bulk.revisited_ratios(), incremental.revisited_ratios())
+    np.testing.assert_allclose(incremental.revisited_ratios(), [0.25, 0.25, 0.0, 0.0])
+
+
+### a replaced day drops its old pairs ###
+def test_replaced_day_matches_bulk():
+    geoms = [shapely.box(0, 0, 10, 10), shapely.box(5, 5, 15, 15), shapely.box(20, 0, 30, 10)]
+    index = DayOverlapIndex.from_geoms(['d0', 'd1', 'd2'], geoms)
+    index.add('d1', shapely.box(15, 0, 25, 10))
+    expected = DayOverlapIndex.from_geoms(['d0', 'd1', 'd2'], [geoms[0], shapely.box(15, 0, 25, 10), geoms[2]])
+    assert {i: set(p) for i, p in index.pairs.items() if p} == {i: set(p) for i, p in expected.pairs.items() if p}
+    np.testing.assert_allclose(index.revisited_ratios(), expected.revisited_ratios())
+    assert index.hull.equals(expected.hull)
+
+
+### days without area (a point or a line inside another day) score 0 without divide warnings ###
+def test_zero_area_days_score_zero():
+    geoms = [shapely.box(0, 0, 10, 10), shapely.Point(5, 5), shapely.LineString([(1, 1), (2, 2)]), shapely.box(5, 0, 15, 10)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        index = DayOverlapIndex.from_geoms(['d0', 'd1', 'd2', 'd3'], geoms)
+        ratios = index.revisited_ratios()
+        ls = index.revisited_ls()
+    np.testing.assert_allclose(ratios, [0.5, 0.0, 0.0, 0.5])
+    assert list(ls.values) == [50.0, 0.0, 0.0, 50.0]
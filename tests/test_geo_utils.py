@@ -0,0 +1,19 @@
+import datetime
+
+import pandas as pd
+
+import geo_utils as gu
+
+
+### fixes with a utc offset are grouped by their local day ###
+def test_convex_hulls_use_local_day_of_tz_aware_fixes():
+    df = pd.DataFrame({'latitude': [52.50, 52.51, 52.50, 52.52, 52.53, 52.52],
+                       'longitude': [13.40, 13.41, 13.42, 13.40, 13.41, 13.43],
+                       'tracked_at_date': ['2021-05-01T10:00:00+02:00', '2021-05-01T12:00:00+02:00', '2021-05-01T14:00:00+02:00',
+                                           '2021-05-02T01:30:00+02:00', '2021-05-02T12:00:00+02:00', '2021-05-02T15:00:00+02:00']})
+    gdf = gu.gdf_from_df(df,['latitude','longitude'])
+    hulls, dates = gu.create_convex_hulls(gdf)
+    assert list(dates) == [datetime.date(2021, 5, 1), datetime.date(2021, 5, 2)]
+    assert list(hulls.geometry.geom_type) == ['Polygon', 'Polygon']
+    assert list(hulls.index) == sorted(set(gdf.index))
+    assert hulls.geometry.iloc[1].equals(gdf.loc[[datetime.date(2021, 5, 2)]].geometry.union_all().convex_hull)
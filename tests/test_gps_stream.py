@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+import geo_utils as gu
+import gps_stream
+
+
+### tracking export with several days, a day with one fix and unsorted rows ###
+def _export(tmp_path, n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('2021-05-01') + pd.to_timedelta(np.sort(rng.integers(0, 5 * 86400, n)), unit='s')
+    df = pd.DataFrame({'latitude': 52.52 + rng.normal(0, 0.01, n), 'longitude': 13.40 + rng.normal(0, 0.01, n),
+                       'tracked_at_date': times.strftime('%Y-%m-%dT%H:%M:%S')})
+    df.loc[len(df)] = [52.60, 13.50, '2021-05-09T12:00:00']
+    df = df.sample(frac=1, random_state=0).reset_index(drop=True)
+    path = tmp_path / 'tracks.csv'
+    df.to_csv(path, index=False)
+    return str(path), df
+
+
+### hulls streamed in small batches match create_convex_hulls on the whole frame ###
+def test_convex_hulls_from_file_match_create_convex_hulls(tmp_path):
+    path, df = _export(tmp_path)
+    expected, expected_dates = gu.create_convex_hulls(gu.gdf_from_df(df.copy(),['latitude','longitude']))
+    got, dates = gps_stream.convex_hulls_from_file(path,['latitude','longitude'],chunksize=700)
+    assert list(dates) == list(expected_dates)
+    assert list(got.index) == list(expected.index)
+    assert got.crs == expected.crs
+    for a, b in zip(got.geometry, expected.geometry):
+        assert a.normalize().equals_exact(b.normalize(), 1e-12)
+
+
+### iter_days on a time sorted export gives every fix of a day together ###
+def test_iter_days_groups_sorted_export(tmp_path):
+    path, df = _export(tmp_path)
+    df.sort_values('tracked_at_date').to_csv(path, index=False)
+    counts = {day: len(x) for day, x, _, _ in gps_stream.iter_days(path,['latitude','longitude'],chunksize=500)}
+    expected = pd.to_datetime(df['tracked_at_date']).dt.date.value_counts().to_dict()
+    assert counts == expected
@@ -0,0 +1,42 @@
+import json
+
+import graph_arrays
+
+
+### merged ways (lists), mixed types and graph metadata survive the columnar format ###
+def test_columnar_round_trip_is_lossless(tmp_path, small_graph):
+    u, v, k = next(iter(small_graph.edges(keys=True)))
+    small_graph.edges[u, v, k].update(osmid=[11, 12], highway=['residential', 'footway'])
+    small_graph.edges[v, u, k].update(osmid=13, highway='path', oneway=True)
+    graph_arrays.write_columnar_graph(small_graph, str(tmp_path / 'g'))
+    G = graph_arrays.read_columnar_graph(str(tmp_path / 'g'))
+    assert G.graph['simplified'] is False and G.graph['crs'] == 'epsg:4326'
+    for a, b, key, data in small_graph.edges(keys=True, data=True):
+        for name in graph_arrays.EDGE_ATTRS:
+            assert G.edges[a, b, key][name] == data[name]
+            assert type(G.edges[a, b, key][name]) is type(data[name])
+    assert all(G.nodes[n]['street_count'] == d['street_count'] for n, d in small_graph.nodes(data=True))
+
+
+def test_reads_version_1_categories(tmp_path, small_graph):
+    path = tmp_path / 'g'
+    graph_arrays.write_columnar_graph(small_graph, str(path))
+    meta = json.loads((path / 'meta.json').read_text())
+    meta['version'] = 1
+    meta['edge_attrs']['highway'] = ['residential']
+    (path / 'meta.json').write_text(json.dumps(meta))
+    G = graph_arrays.read_columnar_graph(str(path))
+    assert {d['highway'] for _, _, d in G.edges(data=True)} == {'residential'}
+
+
+### the npz cache format keeps the listed node and edge attributes ###
+def test_npz_round_trip_keeps_attributes(tmp_path, small_graph):
+    u, v, k = next(iter(small_graph.edges(keys=True)))
+    small_graph.edges[u, v, k].update(osmid=[11, 12], highway=['residential', 'footway'])
+    del small_graph.edges[v, u, k]['highway']
+    arrays = graph_arrays.GraphArrays.from_networkx(small_graph, node_attrs=('street_count',), edge_attrs=graph_arrays.EDGE_ATTRS)
+    arrays.save(str(tmp_path / 'g.npz'))
+    G = graph_arrays.GraphArrays.load(str(tmp_path / 'g.npz')).to_networkx()
+    for a, b, key, data in small_graph.edges(keys=True, data=True):
+        assert {n: G.edges[a, b, key].get(n) for n in graph_arrays.EDGE_ATTRS} == {n: data.get(n) for n in graph_arrays.EDGE_ATTRS}
+    assert all(G.nodes[n]['street_count'] == d['street_count'] for n, d in small_graph.nodes(data=True))
@@ -0,0 +1,27 @@
+import pickle
+
+import graph_cache
+import reachability
+
+
+def test_source_graph_from_pickle(tmp_path, small_graph):
+    path = tmp_path / 'roads_walk_test.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump(small_graph, f)
+    G = graph_cache.load_source_graph(str(path), (13.3995, 52.5195, 13.4015, 52.5215))
+    assert set(G.nodes) == {0, 1, 3, 4}
+
+
+### isochrones from the cached arrays match reachability_polygon on the same tile graph, on a miss and on a hit ###
+def test_cached_reachability_polygon_matches_networkx(tmp_path, small_graph):
+    path = tmp_path / 'roads_walk_test.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump(small_graph, f)
+    point, dist, trip_times = (13.4012, 52.5208), 300, [1, 2, 3]
+    G = graph_cache.load_source_graph(str(path), graph_cache.tile_bounds(point, dist))
+    expected = reachability.reachability_polygon(G, point, trip_times, 4.5)
+    for _ in range(2):
+        got = graph_cache.reachability_polygon(str(path), point, dist, trip_times, 4.5, cache_dir=str(tmp_path / 'cache'))
+        assert got.crs == expected.crs
+        for a, b in zip(got.geometry, expected.geometry):
+            assert a.symmetric_difference(b).area < 1e-6 * b.area
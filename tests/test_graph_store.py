@@ -0,0 +1,44 @@
+import pickle
+
+import create_shape_file as csf
+import graph_store
+
+
+def _pickle(tmp_path, G):
+    path = tmp_path / 'roads_walk_test.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump(G, f)
+    return str(path)
+
+
+### tile store built from a plain pickle keeps the graph metadata types ###
+def test_store_from_pickle_keeps_graph_metadata(tmp_path, small_graph):
+    store = str(tmp_path / 'tiles')
+    graph_store.build_graph_store_from_pickle(_pickle(tmp_path, small_graph), store)
+    G = graph_store.load_subgraph_in_polygon(store, csf.gu.create_point_buffer((13.401, 52.521), 1000).to_crs('epsg:4326').geometry[0])
+    assert G.graph['simplified'] is False and G.graph['crs'] == 'epsg:4326'
+    assert set(G.nodes) == set(small_graph.nodes)
+
+
+### the tile store and the full pickle give the same subgraph ###
+def test_load_graph_from_pickle_store_and_pickle_agree(tmp_path, small_graph):
+    pickle_path = _pickle(tmp_path, small_graph)
+    store = str(tmp_path / 'tiles')
+    graph_store.build_graph_store_from_pickle(pickle_path, store)
+    from_pickle, _ = csf.load_graph_from_pickle((13.401, 52.521), 120, pickle_path, str(tmp_path / 'missing'))
+    from_store, _ = csf.load_graph_from_pickle((13.401, 52.521), 120, pickle_path, store)
+    assert from_pickle is not None
+    assert set(from_pickle.nodes) == set(from_store.nodes)
+    assert set(from_pickle.edges) == set(from_store.edges)
+
+
+### a store rebuilt in the same process is read again, not served from the tile cache ###
+def test_rebuilt_store_is_not_served_from_cache(tmp_path, small_graph):
+    store = str(tmp_path / 'tiles')
+    polygon = csf.gu.create_point_buffer((13.401, 52.521), 1000).to_crs('epsg:4326').geometry[0]
+    graph_store.build_graph_store(small_graph, store)
+    assert len(graph_store.load_subgraph_in_polygon(store, polygon)) == 9
+    small_graph.remove_node(4)
+    graph_store.build_graph_store(small_graph, store)
+    G = graph_store.load_subgraph_in_polygon(store, polygon)
+    assert len(G) == 8 and 4 not in G
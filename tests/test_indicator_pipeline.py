@@ -0,0 +1,66 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+import indicator_pipeline as ip
+import instrumentation
+
+
+def _participants(tmp_path, users):
+    rng = np.random.default_rng(0)
+    participants = []
+    for user in users:
+        clusters = tmp_path / f'clusters_{user}.csv'
+        pd.DataFrame({'center_longitude': 13.40 + rng.random(10) * 0.01, 'center_latitude': 52.52 + rng.random(10) * 0.01,
+                      'place_id': [0, 0, 1, 2, 2, 2, 3, 4, 5, 5]}).to_csv(clusters, index=False)
+        participants.append({'user': user, 'tracks': None, 'clusters': str(clusters), 'home_lon': 13.401, 'home_lat': 52.521})
+    return participants
+
+
+def _config(tmp_path, small_graph):
+    graph = tmp_path / 'roads_walk_test.pkl'
+    with open(graph, 'wb') as f:
+        pickle.dump(small_graph, f)
+    return dict(ip.CONFIG, graph=str(graph), network_dist=200)
+
+
+### runs with different stage sets write parts with one schema and keep the indicators of the other stages ###
+def test_store_schema_is_fixed_across_stage_sets(tmp_path, small_graph):
+    config = _config(tmp_path, small_graph)
+    store, cache = str(tmp_path / 'store'), str(tmp_path / 'cache')
+    first = ip.run_pipeline(_participants(tmp_path, ['a']), config, store, cache, workers=1, stages=['places'])
+    second = ip.run_pipeline(_participants(tmp_path, ['a', 'b']), config, store, cache, workers=1, stages=['network'])
+    assert list(first.columns) == list(second.columns) == ip.COLUMNS
+    store_df = ip.read_feature_store(store)
+    assert list(store_df.index) == ['a', 'b']
+    assert store_df.loc['a', 'NumUniqPl'] == 6 and np.isnan(store_df.loc['b', 'NumUniqPl'])
+    assert store_df['InterDens'].notna().all()
+
+
+def test_run_returns_only_processed_participants(tmp_path, small_graph):
+    config = _config(tmp_path, small_graph)
+    store, cache = str(tmp_path / 'store'), str(tmp_path / 'cache')
+    ip.run_pipeline(_participants(tmp_path, ['a', 'b']), config, store, cache, workers=1, stages=['places'])
+    df = ip.run_pipeline(_participants(tmp_path, ['b']), config, store, cache, workers=1, stages=['places'])
+    assert list(df.index) == ['b']
+
+
+### profiling does not change the rows, the stage records of the workers come back per participant ###
+def test_profiled_run_matches_plain_run(tmp_path, small_graph):
+    config = _config(tmp_path, small_graph)
+    participants = _participants(tmp_path, ['a', 'b'])
+    plain = ip.run_pipeline(participants, config, str(tmp_path / 'plain'), str(tmp_path / 'plain_cache'), workers=1, stages=['places', 'network'])
+    instrumentation.enable()
+    instrumentation.drain()
+    try:
+        profiled = ip.run_pipeline(participants, config, str(tmp_path / 'profiled'), str(tmp_path / 'profiled_cache'), workers=2,
+                                   stages=['places', 'network'])
+        stats = instrumentation.participant_stats()
+    finally:
+        instrumentation.drain()
+        instrumentation.disable()
+    pd.testing.assert_frame_equal(profiled.sort_index(), plain.sort_index())
+    assert stats.loc[('a', 'pipeline.participant'), 'calls'] == 1
+    assert stats.loc[('b', 'pipeline.participant'), 'calls'] == 1
+    assert {'pipeline.places', 'pipeline.network'} <= set(stats.index.get_level_values('stage'))
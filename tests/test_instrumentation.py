@@ -0,0 +1,19 @@
+import instrumentation
+
+
+### memory switched on while a stage is open -> that stage is timed only, the next one gets its peak ###
+def test_enable_memory_inside_open_stage():
+    instrumentation.enable()
+    instrumentation.drain()
+    try:
+        with instrumentation.stage('outer'):
+            instrumentation.enable(memory=True)
+            with instrumentation.stage('inner'):
+                data = [0] * 100000
+        records = {r['stage']: r for r in instrumentation.drain()}
+    finally:
+        instrumentation.disable()
+    assert 'peak_mb' not in records['outer']
+    assert records['inner']['peak_mb'] > 0
+    assert records['inner']['parent'] == 'outer'
+    del data
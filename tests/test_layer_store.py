@@ -0,0 +1,43 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+import create_shape_file as csf
+import layer_store
+
+
+def _layer(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    gdf = gpd.GeoDataFrame({'name': [f'poi{i}' for i in range(n)], 'kind': rng.integers(0, 3, n)},
+                           geometry=shapely.points(13.40 + rng.random(n) * 0.05, 52.52 + rng.random(n) * 0.05), crs='epsg:4326')
+    gdf.to_file(path)
+    return gdf
+
+
+### bbox reads from the store match the shapefile bbox read ###
+def test_store_bbox_read_matches_shapefile(tmp_path):
+    path = str(tmp_path / 'Health_layer_points.shp')
+    _layer(path, 500)
+    layer_store.build_layer_store(path,row_group_size=64)
+    assert layer_store.has_store(path)
+    bbox = (13.41, 52.53, 13.43, 52.55)
+    expected = gpd.read_file(path, bbox=bbox)
+    got = layer_store.read_layer(path,bbox=bbox)
+    assert len(got) == len(expected) > 0
+    assert list(got['name']) == list(expected['name'])
+    assert got.geometry.equals(expected.geometry)
+
+
+### a shapefile written after its store was built is read from the shapefile again ###
+def test_store_of_older_shapefile_is_ignored(tmp_path):
+    path = str(tmp_path / 'Health_layer_points.shp')
+    _layer(path, 50)
+    layer_store.build_layer_store(path)
+    new = _layer(path, 80, seed=1)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert not layer_store.has_store(path)
+    data = csf.read_layer(path)
+    assert list(data['name']) == list(new['name']) and len(data) == 80
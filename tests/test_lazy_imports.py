@@ -0,0 +1,24 @@
+import colorsys
+
+import _lazy
+import import_budget
+
+
+### the core lifespace / overlay modules import without osmnx, networkx, scipy or matplotlib ###
+def test_core_modules_do_not_import_heavy_modules():
+    assert import_budget.measure(', '.join(import_budget.MODULES), repeat=1)['heavy'] == []
+
+
+### the proxy imports on first attribute access and runs its hooks once ###
+def test_lazy_module_loads_on_first_access(monkeypatch):
+    monkeypatch.setattr(_lazy, '_proxies', {})
+    loaded = []
+    proxy = _lazy.lazy_import('colorsys', on_load=loaded.append)
+    assert loaded == []
+    assert proxy.rgb_to_hsv(1, 0, 0) == colorsys.rgb_to_hsv(1, 0, 0)
+    assert proxy.hsv_to_rgb(0, 1, 1) == (1, 0, 0)
+    assert loaded == [colorsys]
+    assert _lazy.lazy_import('colorsys') is proxy
+    late = []
+    _lazy.lazy_import('colorsys', on_load=late.append)
+    assert late == [colorsys]
@@ -0,0 +1,50 @@
+import geopandas as gpd
+import numpy as np
+import osmnx as ox
+import pandas as pd
+import shapely
+
+import lifespace
+
+
+### overlapping daily hulls around Berlin, one day far off ###
+def _hulls(days=6, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2021-05-01', periods=days).date
+    geoms = [shapely.convex_hull(shapely.multipoints(np.column_stack([13.40 + rng.normal(0, 0.01, 50) + 0.005 * i,
+                                                                      52.52 + rng.normal(0, 0.005, 50)])))
+             for i in range(days)]
+    geoms[-1] = shapely.affinity.translate(geoms[-1], 0.2, 0.1)
+    return gpd.GeoDataFrame(geometry=geoms, crs='epsg:4326').set_index(pd.Index(dates)), dates
+
+
+### the geo_utils indicators as they were before LifespaceIndicators (one projection and overlay per call) ###
+def _reference(gdf, dates):
+    gdf_p = ox.project_gdf(gdf).set_index(dates)
+    hull = gdf_p.unary_union.convex_hull
+    hull_df = gpd.GeoDataFrame(geometry=gpd.GeoSeries(hull)).set_crs(gdf_p.crs)
+    revisited, overlapping = [], []
+    for day in dates:
+        inter = gpd.overlay(gdf_p.loc[[day]], gdf_p.loc[gdf_p.index != day, :], how='intersection')
+        revisited.append(inter.unary_union.area / gdf_p.loc[[day]].unary_union.area if len(inter) else 0)
+        inter = gpd.overlay(gdf_p.loc[[day]], hull_df, how='intersection', keep_geom_type=False)
+        overlapping.append(inter.unary_union.area / hull_df.area[0] if len(inter) else 0)
+    return {'RevisitedLS': round(pd.Series(revisited, index=dates) * 100, 3),
+            'CHull_skm': hull.area / 1e6,
+            'CHull_skm_daily': gdf_p.area / 1e6,
+            'GravCompact': hull.length / (2 * np.sqrt(np.pi * hull.area)),
+            'GravCompact_daily': gdf_p.length / (2 * np.sqrt(np.pi * gdf_p.area)),
+            'day_convex_overlapping': round(pd.Series(overlapping, index=dates) * 100, 2)}
+
+
+def test_indicators_match_geo_utils_reference():
+    gdf, dates = _hulls()
+    got = lifespace.lifespace_indicators(gdf, dates)
+    expected = _reference(gdf, dates)
+    assert got.keys() == expected.keys()
+    for name in ('CHull_skm', 'GravCompact'):
+        np.testing.assert_allclose(got[name], expected[name], rtol=1e-9)
+    for name in ('CHull_skm_daily', 'GravCompact_daily', 'RevisitedLS', 'day_convex_overlapping'):
+        assert list(got[name].index) == list(expected[name].index)
+        np.testing.assert_allclose(got[name].values, expected[name].values, rtol=1e-9, atol=0.011 if name == 'day_convex_overlapping' else 0.0011)  # one unit of the rounding
+    assert got['RevisitedLS'].iloc[-1] == 0
@@ -0,0 +1,38 @@
+import pickle
+
+import numpy as np
+
+import create_shape_file as csf
+import graph_arrays
+import network_metrics
+import synthetic
+
+
+def test_region_arrays_from_pickle(tmp_path, small_graph):
+    path = tmp_path / 'roads_walk_test.pkl'
+    with open(path, 'wb') as f:
+        pickle.dump(small_graph, f)
+    arrays = network_metrics.load_region_arrays(str(path))
+    expected = graph_arrays.GraphArrays.from_networkx(small_graph,node_attrs=('street_count',),edge_attrs=('osmid',))
+    assert len(arrays) == 9 and len(arrays.u) == small_graph.number_of_edges()
+    np.testing.assert_array_equal(arrays.u, expected.u)
+    np.testing.assert_array_equal(arrays.v, expected.v)
+
+
+### metrics of many homes on one region graph match osmnx basic_stats of load_graph_from_pickle per home ###
+def test_batch_metrics_match_basic_stats(tmp_path):
+    G = synthetic.planar_graph(400)
+    #### one way streets: the reverse direction of every 15th street removed
+    for u, v, k in list(G.edges(keys=True))[::15]:
+        if G.has_edge(v, u, k) and u < v:
+            G.remove_edge(v, u, k)
+            G.edges[u, v, k]['oneway'] = True
+    path = str(tmp_path / 'roads_walk_test.pkl')
+    with open(path, 'wb') as f:
+        pickle.dump(G, f)
+    homes = [(13.40, 52.52), (13.405, 52.523), (13.395, 52.515)]
+    got = network_metrics.network_metrics_batch(network_metrics.load_region_arrays(path), homes, 500)
+    for i, home in enumerate(homes):
+        _, expected = csf.load_graph_from_pickle(home, 500, path, str(tmp_path / 'missing'))
+        for name in got.columns:
+            np.testing.assert_allclose(got.loc[i, name], expected[name], rtol=1e-9, err_msg=name)
@@ -0,0 +1,29 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+import ols_cv
+
+
+def _data(n=30, p=4, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, p))
+    return X, X @ rng.normal(size=p) + rng.normal(size=n)
+
+
+### closed form loo and k fold predictions are the refit predictions ###
+def test_cv_predictions_match_refit():
+    X, y = _data()
+    folds = ols_cv.kfold_labels(len(y), 5)
+    for f in (None, folds):
+        np.testing.assert_allclose(ols_cv.cv_predictions(X,y,f), ols_cv.refit_predictions(LinearRegression(),X,y,f))
+
+
+### a dummy set for one row only gives that row leverage 1 -> refitted, not divided by 0 ###
+def test_cv_predictions_refit_rows_with_leverage_one():
+    X, y = _data()
+    X = np.column_stack([X, np.eye(len(y))[0]])
+    pred = ols_cv.cv_predictions(X,y)
+    assert np.isfinite(pred).all()
+    np.testing.assert_allclose(pred, ols_cv.refit_predictions(LinearRegression(),X,y), atol=1e-8)
+    folds = np.arange(len(y)) % 5
+    np.testing.assert_allclose(ols_cv.cv_predictions(X,y,folds), ols_cv.refit_predictions(LinearRegression(),X,y,folds), atol=1e-8)
@@ -0,0 +1,105 @@
+import networkx as nx
+import osmnx as ox
+import pytest
+from shapely.geometry import Polygon, box
+
+import osm_acquisition as oa
+
+
+def _raise(exc):
+    def fetch(*args, **kwargs):
+        raise exc
+    return fetch
+
+
+@pytest.mark.parametrize('exc', [ox._errors.InsufficientResponseError('no data'),
+                                 ValueError('Found no graph nodes within the requested polygon')])
+def test_empty_tile_gives_empty_graph(monkeypatch, tmp_path, exc):
+    monkeypatch.setattr(ox.graph, 'graph_from_polygon', _raise(exc))
+    path = oa._graph_task((str(tmp_path / '00000.pkl'), box(0, 0, 1, 1), 'walk'))
+    G = oa.read_tile(path)
+    assert isinstance(G, nx.MultiDiGraph) and len(G) == 0
+
+
+def test_other_value_errors_are_raised(monkeypatch):
+    monkeypatch.setattr(ox.graph, 'graph_from_polygon', _raise(ValueError('something else')))
+    with pytest.raises(ValueError, match='something else'):
+        oa.fetch_graph(box(0, 0, 1, 1))
+
+
+### two tiles, the street of the second tile reaches the main network only through the first ###
+def test_tiles_are_stitched_before_largest_component(monkeypatch, tmp_path):
+    def fetch(polygon, retain_all=False, **kwargs):
+        assert retain_all
+        G = nx.MultiDiGraph(crs='epsg:4326')
+        if polygon.bounds[0] < 0.5:
+            G.add_edges_from([(1, 2), (2, 3), (5, 6)])
+        else:
+            G.add_edges_from([(3, 4)])
+        for n in G.nodes:
+            G.nodes[n].update(x=0.0, y=0.0)
+        return G
+    monkeypatch.setattr(ox.graph, 'graph_from_polygon', fetch)
+    monkeypatch.chdir(tmp_path)
+    oa.acquire_street_graph({'test': box(0, 0, 1, 1)}, tiles_dir=str(tmp_path / 'tiles'), tile_size=0.5, workers=1)
+    G = oa.read_tile(tmp_path / 'roads_walk_test.pkl')
+    assert set(G.nodes) == {1, 2, 3, 4}
+
+
+OSM_XML = '''<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+ <node id="1" lat="52.5200" lon="13.4000"/>
+ <node id="2" lat="52.5200" lon="13.4010"/>
+ <node id="3" lat="52.5200" lon="13.4020"/>
+ <node id="4" lat="52.5210" lon="13.4020"/>
+ <node id="5" lat="52.5210" lon="13.4000"/>
+ <node id="6" lat="52.5215" lon="13.4010"><tag k="amenity" v="bench"/></node>
+ <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+ <way id="11"><nd ref="3"/><nd ref="4"/><tag k="highway" v="footway"/></way>
+ <way id="12"><nd ref="4"/><nd ref="5"/><tag k="highway" v="motorway"/><tag k="oneway" v="yes"/></way>
+ <way id="13"><nd ref="5"/><nd ref="1"/><tag k="highway" v="residential"/><tag k="foot" v="no"/></way>
+</osm>
+'''
+
+
+def _extract(tmp_path):
+    path = tmp_path / 'extract.osm'
+    path.write_text(OSM_XML)
+    return str(path)
+
+
+### a local .osm extract keeps only the ways overpass returns for the network type ###
+def test_street_graph_from_local_osm(tmp_path):
+    source = _extract(tmp_path)
+    walk = oa.read_local_graph(source, box(13.39, 52.51, 13.41, 52.53), 'walk')
+    drive = oa.read_local_graph(source, box(13.39, 52.51, 13.41, 52.53), 'drive')
+    assert {d['osmid'] for _, _, d in walk.edges(data=True)} == {10, 11}
+    assert {d['osmid'] for _, _, d in drive.edges(data=True)} == {10, 12, 13}
+    assert all('foot' not in d for _, _, d in drive.edges(data=True))
+
+
+### the extract is parsed once, the tiles are clipped from it and match a parse per tile ###
+def test_local_extract_is_parsed_once(monkeypatch, tmp_path):
+    source = _extract(tmp_path)
+    parse = ox.geometries.geometries_from_xml
+    calls = []
+    monkeypatch.setattr(ox.geometries, 'geometries_from_xml', lambda *args, **kwargs: calls.append(1) or parse(*args, **kwargs))
+    places = {'test': box(13.3995, 52.5195, 13.4025, 52.5220)}
+    tags = {'highway': True, 'amenity': True}
+    paths = oa.acquire_geometry_tiles(places, tags, 'layer', str(tmp_path / 'tiles'), tile_size=0.001, source=source)
+    assert len(paths) > 1 and len(calls) == 1
+    assert sum(len(oa.read_tile(p)) > 0 for p in paths) > 1
+    for path, tile in zip(paths, oa.polygon_tiles(places['test'], 0.001)):
+        expected = parse(source, polygon=tile, tags=tags)
+        got = oa.read_tile(path)
+        assert set(got.index) == set(expected.index)
+        assert set(got.columns) == set(expected.columns)
+    oa.acquire_geometry_tiles(places, tags, 'layer', str(tmp_path / 'tiles'), tile_size=0.001, source=source)
+    assert len(calls) == 1
+
+
+### a place without tiles gives an empty graph instead of failing in compose_all ###
+def test_place_without_tiles_gives_empty_graph(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    oa.acquire_street_graph({'test': Polygon()}, tiles_dir=str(tmp_path / 'tiles'), workers=1)
+    assert len(oa.read_tile(tmp_path / 'roads_walk_test.pkl')) == 0
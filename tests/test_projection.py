@@ -0,0 +1,46 @@
+import geopandas as gpd
+import numpy as np
+import osmnx as ox
+import shapely
+
+import create_shape_file as csf
+import geo_utils as gu
+import projection
+
+
+def _polygons(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = np.column_stack([13.40 + rng.normal(0, 0.05, n), 52.52 + rng.normal(0, 0.03, n)])
+    geoms = shapely.buffer(shapely.points(centers), rng.uniform(0.0005, 0.002, n))
+    return gpd.GeoDataFrame({'geom_type': ['way'] * n, 'amenity': ['pharmacy'] * n}, geometry=geoms, crs='epsg:4326').set_index('geom_type')
+
+
+### cached transformers project like ox.project_gdf, to utm and to a given crs ###
+def test_project_gdf_matches_osmnx():
+    gdf = _polygons()
+    for to_crs in (None, 'epsg:3035'):
+        expected = ox.project_gdf(gdf, to_crs=to_crs)
+        got = projection.project_gdf(gdf, to_crs=to_crs)
+        assert got.crs == expected.crs
+        np.testing.assert_allclose(shapely.get_coordinates(got.geometry.values), shapely.get_coordinates(expected.geometry.values), atol=1e-6)
+
+
+### poly_to_centroid as before: centroids in utm, back in wgs84 ###
+def test_poly_to_centroid_matches_projected_centroids():
+    gdf = _polygons()
+    expected = ox.project_gdf(gdf.copy())
+    expected['geometry'] = expected.centroid
+    expected = expected.to_crs('epsg:4326')
+    got = csf.poly_to_centroid(gdf.copy())
+    assert list(got.index) == ['node'] * len(gdf) and got.crs == expected.crs
+    np.testing.assert_allclose(shapely.get_coordinates(got.geometry.values), shapely.get_coordinates(expected.geometry.values), atol=1e-9)
+
+
+### create_point_buffer as before: point projected with ox.project_gdf and buffered with GeoSeries.buffer ###
+def test_point_buffer_matches_projected_buffer():
+    for proj in (None, 'epsg:25833'):
+        point = ox.project_gdf(gu.build_geo_df((13.41, 52.52)), to_crs=proj)
+        expected = point.buffer(500)
+        got = gu.create_point_buffer((13.41, 52.52), 500, proj=proj)
+        assert got.crs == expected.crs
+        assert got.geometry[0].equals_exact(expected[0], 1e-6)
@@ -0,0 +1,14 @@
+import reachability
+
+
+### batch isochrones match one reachability_polygon call per origin, in process and over a pool ###
+def test_batch_isochrones_match_single_origin(small_graph):
+    points = [(13.4001, 52.5201), (13.4019, 52.5212), (13.4011, 52.5219)]
+    trip_times = [1, 2, 3]
+    expected = [reachability.reachability_polygon(small_graph, p, trip_times, 4.5) for p in points]
+    for workers in (1, 2):
+        batch = reachability.reachability_polygons(small_graph, points, trip_times, 4.5, ids=['a', 'b', 'c'], workers=workers)
+        assert batch.crs == expected[0].crs
+        for origin, single in zip(['a', 'b', 'c'], expected):
+            for trip_time, geom in zip(sorted(trip_times, reverse=True), single.geometry):
+                assert batch.loc[(origin, trip_time)].geometry.equals(geom)
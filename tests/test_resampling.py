@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import ols_cv
+import resampling
+
+
+def _data(n=25, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 3)), columns=['a', 'b', 'c'])
+    return X, X.values @ [1.0, -0.5, 0.0] + rng.normal(size=n)
+
+
+### a row with leverage 1 leaves the permutation LOO R² undefined (nan) without divide warnings ###
+def test_permutation_r2_is_nan_for_leverage_one():
+    X, y = _data()
+    X['dummy'] = np.eye(len(y))[0]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        resampling._init_worker(ols_cv.design_matrix(X), y)
+        _, r2 = resampling._perm_chunk((np.random.SeedSequence(0), 20))
+    assert np.isnan(r2).all()
+    result = resampling.resample(X,y,n_boot=50,n_perm=50,workers=1)
+    assert result['r2_cv_p_perm'] == 1.0
+
+
+### batched solves give the coefficients and LOO R² of one fit per replicate ###
+def test_batched_ols_matches_single_fits():
+    X, y = _data()
+    Z = ols_cv.design_matrix(X)
+    idx = np.random.default_rng(1).integers(0, len(y), size=(5, len(y)))
+    coefs, r2 = resampling.batched_ols(Z[idx],y[idx])
+    for c, r, rows in zip(coefs, r2, idx):
+        np.testing.assert_allclose(c, np.linalg.lstsq(Z[rows], y[rows], rcond=None)[0], atol=1e-10)
+        np.testing.assert_allclose(r, ols_cv.cross_validate(X.values[rows],y[rows])[1], rtol=1e-9)
+    resampling._init_worker(Z,y)
+    perm_coefs, perm_r2 = resampling._perm_chunk((np.random.SeedSequence(2), 5))
+    Y = y[np.argsort(np.random.default_rng(np.random.SeedSequence(2)).random((5, len(y))), axis=1)]
+    expected_coefs, expected_r2 = resampling.batched_ols(np.broadcast_to(Z, (5,) + Z.shape),Y)
+    np.testing.assert_allclose(perm_coefs, expected_coefs, atol=1e-10)
+    np.testing.assert_allclose(perm_r2, expected_r2, rtol=1e-9)
+
+
+### chunks carry their own seeds -> the same replicates for any number of workers ###
+def test_resample_is_independent_of_workers():
+    X, y = _data()
+    one = resampling.resample(X,y,n_boot=300,n_perm=300,chunk=100,workers=1)
+    two = resampling.resample(X,y,n_boot=300,n_perm=300,chunk=100,workers=2)
+    pd.testing.assert_frame_equal(one['summary'], two['summary'])
+    np.testing.assert_array_equal(one['boot_r2_cv'], two['boot_r2_cv'])
+    np.testing.assert_array_equal(one['perm_r2_cv'], two['perm_r2_cv'])
+    assert one['r2_cv_p_perm'] == two['r2_cv_p_perm']
+    np.testing.assert_allclose(one['summary']['coef'], np.linalg.lstsq(ols_cv.design_matrix(X), y, rcond=None)[0])
@@ -0,0 +1,16 @@
+import run_benchmarks
+
+
+### a benchmark that fails now but was timed in the baseline is a regression ###
+def test_compare_counts_new_errors_as_regressions():
+    baseline = {'results': [{'benchmark': 'RevisitedLS', 'size': 10, 'time_median': 0.1},
+                            {'benchmark': 'RevisitedLS', 'size': 30, 'time_median': 0.2}]}
+    results = [{'benchmark': 'RevisitedLS', 'size': 10, 'error': 'ValueError: broken'},
+               {'benchmark': 'RevisitedLS', 'size': 30, 'time_median': 0.2}]
+    assert run_benchmarks.compare(results,baseline) == [results[0]]
+
+
+### any failed benchmark gives a non-zero exit code, with or without a baseline ###
+def test_main_fails_on_errors(monkeypatch):
+    monkeypatch.setattr(run_benchmarks, 'run', lambda names, sweep, repeat: [{'benchmark': 'RevisitedLS', 'size': 10, 'error': 'ValueError: broken'}])
+    assert run_benchmarks.main(['--only', 'RevisitedLS']) == 1
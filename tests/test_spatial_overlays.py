@@ -0,0 +1,24 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+import projection
+import spatial_overlays as so
+
+
+### a point inside the 40 m circle but outside its 64 segment buffer polygon counts in both cluster functions ###
+def test_cluster_counts_agree_near_the_radius(tmp_path):
+    lon, lat = 13.40, 52.52
+    proj = projection.utm_crs(lon, lat)
+    x, y = projection.transform_xy(np.array([lon]), np.array([lat]), projection.WGS84, proj)
+    angle = np.pi / 64  # halfway between two buffer vertices
+    px, py = x + np.array([39.99 * np.cos(angle), 41.0]), y + np.array([39.99 * np.sin(angle), 0.0])
+    plon, plat = projection.transform_xy(px, py, proj, projection.WGS84)
+    gpd.GeoDataFrame({'geom_type': ['node', 'node']}, geometry=shapely.points(plon, plat), crs='epsg:4326').to_file(tmp_path / 'poi_points.shp')
+    df = pd.DataFrame({'center_longitude': [lon], 'center_latitude': [lat], 'place_id': [0],
+                       'begin': ['2021-05-01'], 'end': ['2021-05-01']})
+    layers = {'poi': str(tmp_path / 'poi')}
+    counts, _ = so.cluster_layer_counts(layers, df, dist=40, proj=proj)
+    multi = so.cluster_layer_intersections(layers, {'u1': df}, dist=40, proj=proj)
+    assert counts['poi'].tolist() == multi['poi'].tolist() == [1]
@@ -0,0 +1,44 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+
+import ols_cv
+import subset_search
+
+
+def _data(n=30, p=8, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, p)), columns=[f'f{i}' for i in range(p)])
+    y = df['f1'] - 0.5 * df['f4'] + 0.3 * df['f6'] + rng.normal(0, 0.5, n)
+    return df, y
+
+
+### LOO R² of every k subset by refitting LinearRegression once per held out row ###
+def _brute_force(df, y, k):
+    scores = {}
+    for subset in itertools.combinations(df.columns, k):
+        pred = ols_cv.refit_predictions(LinearRegression(), df[list(subset)], y)
+        scores[subset] = r2_score(y, pred)
+    return pd.Series(scores).sort_values(ascending=False)
+
+
+### the top subsets and their scores are those of the brute force search, with and without pruning, in and out of process ###
+def test_subset_search_matches_brute_force_loo():
+    df, y = _data()
+    expected = _brute_force(df, y, 3).iloc[:10]
+    for prune, workers in ((True, 1), (False, 1), (True, 2)):
+        got = subset_search.subset_search(df, y, k=3, top=10, workers=workers, prune=prune)
+        assert list(got['features']) == list(expected.index)
+        np.testing.assert_allclose(got['r2_cv'], expected.values, rtol=1e-9)
+
+
+### the beam keeps the exhaustive winner on an easy signal ###
+def test_beam_search_scores_match_brute_force():
+    df, y = _data()
+    expected = _brute_force(df, y, 3)
+    got = subset_search.beam_search(df, y, k=3, beam_width=20, top=5)
+    assert got['features'][0] == expected.index[0]
+    np.testing.assert_allclose(got['r2_cv'], expected[list(got['features'])].values, rtol=1e-9)